@@ -0,0 +1,132 @@
+"""
+What a user has signed up for: the classes they're registered for and the shows they have tickets to,
+along with the links to their registrations & tickets.
+
+It's all loaded at once, in a query for classes and one for shows, the first time it's asked about, and
+kept for the rest of the request, so the template filters asking about each class or show on a page
+(is_registered, ticket_link, ...) don't query for each of them. Outside of a request it's loaded afresh
+each time.
+"""
+from threading import local
+
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+from accounts.models import ClassMember, EventAttendee
+from classes.models import ApeClass
+from events.models import Event
+
+_request = local()
+
+
+def ordered_as(name, model):
+    """
+    The ordering for a query following name to model that lists them in model's own order (its Meta
+    ordering), the way the profile page always has, then in the order they were signed up for.
+    """
+    return ['{}{}__{}'.format('-' if field.startswith('-') else '', name, field.lstrip('-'))
+            for field in model._meta.ordering] + ['pk']
+
+
+class Entitlements(object):
+    """
+    Everything one user (or user profile, see for_user and for_profile) has signed up for.
+    """
+
+    def __init__(self, **student):
+        # e.g. user_id=1 or id=1, looked up on the user's profile
+        self.student = student
+        self._loaded = False
+
+    def load(self):
+        if self._loaded:
+            return
+        as_student = {'student__' + name: value for name, value in self.student.items()}
+        as_attendee = {'attendee__' + name: value for name, value in self.student.items()}
+
+        self._classes, self.registration_urls = [], {}
+        members = ClassMember.objects.filter(**as_student).select_related('ape_class', 'registration') \
+            .order_by(*ordered_as('ape_class', ApeClass))
+        for member in members:
+            if member.ape_class_id is None or member.ape_class_id in self.registration_urls:
+                continue
+            self._classes.append(member.ape_class)
+            registration = getattr(member, 'registration', None)
+            self.registration_urls[member.ape_class_id] = registration.get_absolute_url() if registration else ''
+
+        self._events, self.ticket_urls = [], {}
+        attendance = EventAttendee.objects.filter(**as_attendee).select_related('event', 'ticket') \
+            .order_by(*ordered_as('event', Event))
+        for attendee in attendance:
+            if attendee.event_id is None or attendee.event_id in self.ticket_urls:
+                continue
+            self._events.append(attendee.event)
+            ticket = getattr(attendee, 'ticket', None)
+            self.ticket_urls[attendee.event_id] = ticket.get_absolute_url() if ticket else ''
+        self._loaded = True
+
+    @property
+    def classes(self):
+        """
+        The classes registered for, in ApeClass's own order.
+        """
+        self.load()
+        return self._classes
+
+    @property
+    def events(self):
+        """
+        The shows with tickets, in Event's own order (the latest first).
+        """
+        self.load()
+        return self._events
+
+    @property
+    def class_ids(self):
+        self.load()
+        return set(self.registration_urls)
+
+    @property
+    def event_ids(self):
+        self.load()
+        return set(self.ticket_urls)
+
+    def is_registered(self, ape_class_id):
+        self.load()
+        return int(ape_class_id) in self.registration_urls
+
+    def registration_url(self, ape_class_id):
+        self.load()
+        return self.registration_urls.get(int(ape_class_id), '')
+
+    def ticket_url(self, event_id):
+        self.load()
+        return self.ticket_urls.get(int(event_id), '')
+
+
+@receiver(request_started)
+def start(**kwargs):
+    _request.entitlements = {}
+
+
+@receiver(request_finished)
+def finish(**kwargs):
+    _request.entitlements = None
+
+
+def _get(kind, pk):
+    known = getattr(_request, 'entitlements', None)
+    if known is None:
+        return Entitlements(**{kind: pk})
+    key = (kind, int(pk))
+    if key not in known:
+        known[key] = Entitlements(**{kind: pk})
+    return known[key]
+
+
+def for_user(user_id):
+    return _get('user_id', user_id)
+
+
+def for_profile(profile_id):
+    return _get('id', profile_id)
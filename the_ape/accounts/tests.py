@@ -1,5 +1,16 @@
+from datetime import timedelta
+
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts import entitlements
+from accounts.models import UserProfile, ClassMember, EventAttendee
+from classes.models import ApeClass
+from events.models import Event
+from pages.templatetags.page_tags import class_registration_link, is_registered, ticket_link
 
 
 class UserProfileTest(TestCase):
@@ -13,3 +24,59 @@ class UserProfileTest(TestCase):
         self.client.login(username="admin", password="admin")
 
         self.regular_user = User.objects.create_user('regular_joe', 'regular_joe@hotmail.net', '12345678')
+        self.profile = UserProfile.objects.create(user=self.regular_user)
+
+    def sign_up(self, count):
+        for i in range(count):
+            event = Event.objects.create(name="Show {}".format(i), bio="A show", ticket_price=5,
+                                         start_time=timezone.now() + timedelta(days=i))
+            EventAttendee.objects.create(event=event, attendee=self.profile).create_ticket()
+            ape_class = ApeClass.objects.create(name="Class {}".format(i), bio="A class", price=300,
+                                                start_date=timezone.now() + timedelta(days=i))
+            ClassMember.objects.create(ape_class=ape_class, student=self.profile).create_registration()
+
+    def get_profile_queries(self):
+        self.client.login(username='regular_joe', password='12345678')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/profile/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_profile_queries(self):
+        self.sign_up(1)
+        queries = self.get_profile_queries()
+        self.sign_up(3)
+        self.assertEqual(self.get_profile_queries(), queries)
+
+    def test_entitlements(self):
+        self.sign_up(2)
+        event, ape_class = Event.objects.get(name="Show 1"), ApeClass.objects.get(name="Class 1")
+        ticket_url = event.event_attendance.get().ticket.get_absolute_url()
+        events = list(Event.objects.filter(name__startswith="Show "))
+        user_entitlements = entitlements.for_user(self.regular_user.pk)
+        with self.assertNumQueries(2):
+            self.assertTrue(user_entitlements.is_registered(ape_class.pk))
+            self.assertEqual(user_entitlements.ticket_url(event.pk), ticket_url)
+            self.assertEqual(user_entitlements.events, events)
+        self.assertEqual(user_entitlements.ticket_url(999999), '')
+
+        # the filters' results match
+        self.assertTrue(is_registered(self.regular_user.pk, ape_class.pk))
+        self.assertFalse(is_registered(self.regular_user.pk, 999999))
+        self.assertEqual(ticket_link(event.pk, self.profile.pk), user_entitlements.ticket_url(event.pk))
+        self.assertEqual(class_registration_link(ape_class.pk, self.profile.pk),
+                         user_entitlements.registration_url(ape_class.pk))
+
+    def test_order(self):
+        # shows are listed latest first, as they always were, not in the order they were bought
+        later = Event.objects.create(name="Later Show", bio="A show", ticket_price=5,
+                                     start_time=timezone.now() + timedelta(days=7))
+        sooner = Event.objects.create(name="Sooner Show", bio="A show", ticket_price=5,
+                                      start_time=timezone.now() + timedelta(days=1))
+        for event in (sooner, later):
+            EventAttendee.objects.create(event=event, attendee=self.profile).create_ticket()
+        self.assertEqual(entitlements.for_user(self.regular_user.pk).events, [later, sooner])
+
+        self.client.login(username='regular_joe', password='12345678')
+        html = self.client.get('/profile/').content.decode('utf-8')
+        self.assertLess(html.index("Later Show"), html.index("Sooner Show"))
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect
 
+from accounts import entitlements
 from accounts.models import Ticket, ClassRegistration
 
 
@@ -18,6 +19,8 @@ class UserProfileView(TemplateView):
             return reverse('auth_login')
 
         context['user'] = user
+        # the same entitlements the ticket & registration link filters read
+        context['entitlements'] = entitlements.for_profile(user.profile.pk)
         return context
 
 
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-18 10:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0008_auto_20180529_0910'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apeclass',
+            name='seats_held',
+            field=models.IntegerField(default=0, help_text='Seats set aside for students registering'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.template.defaultfilters import slugify
 from django.urls import reverse
 from django.utils import timezone
 
+from pages import availability
+
 
 class ApeClass(models.Model):
     """
@@ -31,8 +33,13 @@ class ApeClass(models.Model):
     price = models.DecimalField(decimal_places=2, max_digits=5)
     registration_open = models.BooleanField(default=True)
     students_registered = models.IntegerField(default=0)
+    seats_held = models.IntegerField(default=0, help_text="Seats set aside for students registering")
     deposit_price = models.DecimalField(decimal_places=2, max_digits=5, null=True, blank=True)
 
+    # the students registered, seats held for students registering, and the most there can be
+    # (see pages.availability)
+    availability_fields = ('students_registered', 'seats_held', 'max_enrollment')
+
     class Meta(object):
         verbose_name = 'Ape Class'
         verbose_name_plural = 'Ape Classes'
@@ -61,6 +68,7 @@ class ApeClass(models.Model):
         return reverse('ape_class_wrapper', kwargs={'ape_class_id': self.pk})
 
     def to_data(self):
+        seats = availability.of(self)
         data = {
             "id": self.id,
             "name": self.name,
@@ -69,6 +77,8 @@ class ApeClass(models.Model):
             "price": self.price,
             "num_sessions": self.num_sessions,
             "students_registered": self.students_registered,
+            "seats_left": seats.seats_left,
+            "full": seats.sold_out,
             "is_free": self.is_free
         }
         if self.start_date is not None:
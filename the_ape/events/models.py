@@ -4,6 +4,8 @@ from django.template.defaultfilters import slugify
 from django.urls import reverse
 from django.utils import timezone
 
+from pages import availability
+
 
 class Event(models.Model):
     """
@@ -14,12 +16,16 @@ class Event(models.Model):
     """
     name = models.CharField(max_length=100)
     bio = models.TextField()
-    start_time = models.DateTimeField(null=True)
+    start_time = models.DateTimeField(null=True, db_index=True)
     max_tickets = models.IntegerField(default=20, null=True)
     tickets_sold = models.IntegerField(default=0)
+    tickets_held = models.IntegerField(default=0, help_text="Tickets set aside for buyers checking out")
     ticket_price = models.DecimalField(decimal_places=2, max_digits=5)
     banner = models.ForeignKey('pages.BannerWidget', null=True)
 
+    # the tickets sold, held for buyers checking out, and the most there can be (see pages.availability)
+    availability_fields = ('tickets_sold', 'tickets_held', 'max_tickets')
+
     class Meta:
         ordering = ['-start_time']
 
@@ -49,12 +55,14 @@ class Event(models.Model):
         return reverse('event_wrapper', kwargs={'event_id': self.pk})
 
     def to_data(self):
+        seats = availability.of(self)
         data = {
             "id": self.id,
             "name": self.name,
             "bio": self.bio,
             "ticket_price": self.ticket_price,
-            "tickets_left": self.max_tickets - self.tickets_sold,
+            "tickets_left": seats.seats_left,
+            "sold_out": seats.sold_out,
             "is_free": self.is_free,
             "start_time": timezone.localtime(self.start_time)
         }
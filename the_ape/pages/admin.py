@@ -126,6 +126,12 @@ class PageAdmin(SortedManyToManyAdmin, SaveAsNewAdmin):
                 ('nav_bar_text_color'),
             )
         }),
+        ("Loading & Caching", {
+            "classes": ("grp-collapse grp-closed",),
+            'fields': (
+                ('cache_timeout', 'server_rendered_widgets',),
+            )
+        }),
     )
     form = PageForm
     formfield_overrides = {
@@ -284,7 +290,7 @@ class AttendeeInline(admin.TabularInline):
 
 class EventAdmin(SaveAsNewAdmin):
     list_display = ['name', 'start_time']
-    readonly_fields = ['tickets_sold',]
+    readonly_fields = ['tickets_sold', 'tickets_held']
     inlines = [
         AttendeeInline,
     ]
@@ -299,7 +305,7 @@ class StudentInline(admin.TabularInline):
 
 class ApeClassAdmin(SaveAsNewAdmin):
     list_display = ['name', 'teacher', 'start_date']
-    readonly_fields = ['students_registered',]
+    readonly_fields = ['students_registered', 'seats_held']
     inlines = [
         StudentInline,
     ]
@@ -1,15 +1,19 @@
 from collections import OrderedDict
 from django.apps import apps
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 
 from classes.models import ApeClass
 from events.models import Event
+from pages import cache as fragment_cache
 from pages.models import Page, Widget, PageToWidget
 from pages.admin_forms import get_widget_form
+from pages.views import JSONView
 from people.models import Person, HouseTeam
 
 
@@ -109,3 +113,17 @@ class GenericObjectLookup(TemplateView):
         data['size'] = min(size, 20)
 
         return data
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class FragmentCacheStatsView(JSONView):
+    """
+    Hit & miss counts for the page and widget fragment caches. POST resets them.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return fragment_cache.get_stats()
+
+    def post(self, request, *args, **kwargs):
+        fragment_cache.reset_stats()
+        return fragment_cache.get_stats()
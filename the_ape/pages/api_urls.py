@@ -8,9 +8,13 @@ urlpatterns = [
     url(r'^events/(?P<event_id>\w+).json$', views.EventView.as_view(), name='event'),
     url(r'^people/(?P<person_id>\w+).json$', views.PersonView.as_view(), name='person'),
     url(r'^house_teams/(?P<house_team_id>\w+).json$', views.HouseTeamView.as_view(), name='house_team'),
+    url(r'^batch.json$', views.BatchView.as_view(), name='batch'),
+    url(r'^availability.json$', views.AvailabilityView.as_view(), name='availability'),
+    url(r'^widgets/(?P<widget_id>\d+).json$', views.WidgetView.as_view(), name='widget'),
 
     url(r'^(?P<page_id>\d+).json', views.PageView.as_view(), name="page"),
     url(r'^(?P<page_slug>[a-zA-Z]\w*).json$', views.PageView.as_view(), name="page"),
 
     url(r'^admin/generic_object_lookup/', admin_views.GenericObjectLookup.as_view(), name='generic_object_lookup'),
+    url(r'^admin/fragment_cache_stats.json$', admin_views.FragmentCacheStatsView.as_view(), name='fragment_cache_stats'),
 ]
\ No newline at end of file
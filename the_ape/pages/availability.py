@@ -0,0 +1,126 @@
+"""
+How many seats events and classes have left, and whether they're sold out / full, worked out for a
+whole set of them at a time.
+
+Models with seats say which of their columns count them (availability_fields, the seats taken, the seats
+held for people checking out, and the most there can be, which may be null for no limit). Held seats
+count against what's left just like taken ones. Availability is worked out from rows that are already
+loaded where there are any (see of(), used by the events' and classes' own data), or else for a batch of
+ids from counters kept in the shared cache (see counts(), also behind the availability API and the
+widgets' items). Either way it's
+remembered for the rest of the request, so the is_sold_out and is_full template filters don't query for
+each item they're asked about.
+
+The counters are updated as rows are saved and deleted (see pages.signals) or have seats taken (see
+pages.inventory), and only kept for a short while in case a row changes some other way, e.g. by a
+queryset update():
+
+    SEAT_COUNTS_TIMEOUT     seconds to keep a row's seat counts in the cache for
+"""
+from collections import namedtuple
+from threading import local
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+from pages.shared_cache import MISSING
+
+COUNTS_KEY = 'seats:{label}:{pk}'
+
+Availability = namedtuple('Availability', ['seats_left', 'sold_out'])
+
+_request = local()
+
+
+def known(model):
+    """
+    The availability worked out so far this request for rows of model, by pk.
+    """
+    if not hasattr(_request, 'known'):
+        _request.known = {}
+    return _request.known.setdefault(model, {})
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def forget(**kwargs):
+    _request.known = {}
+
+
+def availability(taken, held, limit):
+    if limit is None:
+        return Availability(seats_left=None, sold_out=False)
+    seats_left = max(limit - taken - held, 0)
+    return Availability(seats_left=seats_left, sold_out=seats_left == 0)
+
+
+def of(instance):
+    """
+    The availability of a row that's already loaded.
+    """
+    result = availability(*[getattr(instance, field) for field in type(instance).availability_fields])
+    known(type(instance))[instance.pk] = result
+    return result
+
+
+def counts_key(model, pk):
+    return COUNTS_KEY.format(label=model._meta.label_lower, pk=pk)
+
+
+def counts_timeout():
+    return getattr(settings, 'SEAT_COUNTS_TIMEOUT', 60)
+
+
+def counts(model, ids):
+    """
+    {pk: (seats taken, seats held, most there can be)} for the rows of model with the given ids, from the
+    cache, with one query for any it doesn't have. Ids with no row are left out.
+    """
+    keys = {counts_key(model, pk): int(pk) for pk in ids}
+    found = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = set(keys.values()) - set(found)
+    if missing:
+        rows = model._base_manager.filter(pk__in=missing).values_list('pk', *model.availability_fields)
+        loaded = {row[0]: row[1:] for row in rows}
+        cache.set_many({counts_key(model, pk): loaded.get(pk, MISSING) for pk in missing}, counts_timeout())
+        found.update(loaded)
+    return {pk: value for pk, value in found.items() if value is not MISSING}
+
+
+def update_counts(instance):
+    value = tuple(getattr(instance, field) for field in type(instance).availability_fields)
+    cache.set(counts_key(type(instance), instance.pk), value, counts_timeout())
+
+
+def remove_counts(instance):
+    cache.set(counts_key(type(instance), instance.pk), MISSING, counts_timeout())
+
+
+def forget_counts(model, pk):
+    """
+    Has the counts of a row that changed without being saved (see pages.inventory) loaded again.
+    """
+    cache.delete(counts_key(model, pk))
+    known(model).pop(int(pk), None)
+
+
+def load(model, ids):
+    """
+    The availability of the rows of model with the given ids (see counts()). Ids with no row are left out.
+    """
+    ids = {int(pk) for pk in ids}
+    model_known = known(model)
+    missing = ids - set(model_known)
+    if missing:
+        for pk, value in counts(model, missing).items():
+            model_known[pk] = availability(*value)
+    return {pk: model_known[pk] for pk in ids if pk in model_known}
+
+
+def get(model, pk):
+    """
+    The availability of one row of model, or None if there's no such row.
+    """
+    return load(model, [pk]).get(int(pk))
@@ -0,0 +1,109 @@
+"""
+Fragment caching for the rendered HTML of pages and their widgets.
+
+How long a fragment is kept is configurable:
+    PAGE_CACHE_TIMEOUT      default timeout for a whole page (a Page's own cache_timeout wins over it)
+    WIDGET_CACHE_TIMEOUTS   maps a widget type ('gallery', 'banner', ...) to a timeout for widgets of that type
+    WIDGET_CACHE_TIMEOUT    timeout for any widget type not listed in WIDGET_CACHE_TIMEOUTS
+
+A timeout of 0 means the fragment isn't cached at all. Hits and misses are counted per fragment name
+('page' for pages, the widget type for widgets) so we can see what the cache is actually buying us.
+
+Fragments are kept separately for logged in visitors and guests. Widgets that show something about the
+logged in visitor themselves (see PER_USER_WIDGET_TYPES), and the pages they're on, are kept per visitor.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from pages import minify, widget_templates
+
+STATS_KEY = 'fragment_cache_stats:{name}:{kind}'
+
+# widget types whose templates show what the logged in visitor has signed up for
+PER_USER_WIDGET_TYPES = frozenset(['ape_class_focus'])
+
+
+def page_cache_timeout(page):
+    if page.cache_timeout is not None:
+        return page.cache_timeout
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 0)
+
+
+def widget_cache_timeout(widget_type):
+    timeouts = getattr(settings, 'WIDGET_CACHE_TIMEOUTS', {})
+    return timeouts.get(widget_type, getattr(settings, 'WIDGET_CACHE_TIMEOUT', 0))
+
+
+def varies_on_user(widget_type):
+    return widget_type in PER_USER_WIDGET_TYPES
+
+
+def user_vary_on(user, per_user=False):
+    """
+    What a fragment's key varies on for the given visitor: who they are for per-user fragments, otherwise
+    just whether they're logged in.
+    """
+    if per_user and user.is_authenticated:
+        return 'user:{}'.format(user.pk)
+    return user.is_authenticated
+
+
+def fragment_key(cache_key, vary_on=()):
+    return make_template_fragment_key(cache_key, vary_on)
+
+
+def stats_names():
+    """
+    Every name fragments are counted under: 'page', and each widget type there's a template for. A fixed
+    set, so counting a fragment never means adding to a list of names shared by every worker.
+    """
+    return ['page'] + sorted(widget_templates.widget_types())
+
+
+def stats_keys():
+    return [STATS_KEY.format(name=name, kind=kind) for name in stats_names() for kind in ('hits', 'misses')]
+
+
+def _count(name, kind):
+    key = STATS_KEY.format(name=name, kind=kind)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted between the add and the incr, just start counting again
+            cache.add(key, 1, timeout=None)
+
+
+def get_or_render(name, key, timeout, render):
+    """
+    Returns the cached fragment stored under key, calling render() to produce (and cache) it on a miss.
+    """
+    value = cache.get(key)
+    if value is None:
+        _count(name, 'misses')
+        value = render()
+        if minify.is_enabled():
+            # minified once here, rather than on every response it goes out in
+            value = minify.minify(value)
+        cache.set(key, value, timeout)
+    else:
+        _count(name, 'hits')
+    return value
+
+
+def get_stats():
+    """
+    {name: {'hits': ..., 'misses': ...}} for each name any fragment has been counted under.
+    """
+    counts = cache.get_many(stats_keys())
+    stats = {}
+    for name in stats_names():
+        hits, misses = [STATS_KEY.format(name=name, kind=kind) for kind in ('hits', 'misses')]
+        if hits in counts or misses in counts:
+            stats[name] = {'hits': counts.get(hits, 0), 'misses': counts.get(misses, 0)}
+    return stats
+
+
+def reset_stats():
+    cache.delete_many(stats_keys())
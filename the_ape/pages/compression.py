@@ -0,0 +1,123 @@
+"""
+Compressed (gzip, and brotli if the brotli package is installed) encodings of pages and API responses.
+
+Compressing is done once per version of a response rather than once per request: responses with an
+ETag (see pages.views) have their compressed encodings kept in the cache under that ETag, and
+export_static writes them next to each exported file for nginx's gzip_static/brotli_static.
+
+    COMPRESSED_RESPONSE_TIMEOUT     seconds to keep a compressed encoding in the cache for
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_KEY = 'compressed_response:{encoding}:{digest}'
+# shorter than this isn't worth compressing
+MIN_LENGTH = 200
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# file suffixes of each encoding in the static export
+FILE_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+re_coding = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+def encodings():
+    """
+    The encodings we can produce, best first.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content)
+    return compress_string(content)
+
+
+def accepted_encoding(accept_encoding):
+    """
+    The best of our encodings the given Accept-Encoding header allows, or None.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        match = re_coding.match(coding)
+        if match:
+            try:
+                qualities[match.group(1).lower()] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    for encoding in encodings():
+        if qualities.get(encoding, qualities.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def is_shareable(response):
+    """
+    Whether a response's content is the same for everyone sending its ETag, so its compressed
+    encodings can be cached under it. Responses that depend on the visitor's cookies aren't.
+    """
+    vary = [v.strip().lower() for v in response.get('Vary', '').split(',')]
+    return response.status_code == 200 and response.has_header('ETag') and 'cookie' not in vary \
+        and not response.cookies
+
+
+def compressed_content(request, response, encoding):
+    if not is_shareable(response):
+        return compress(response.content, encoding)
+    path = request.get_full_path().encode('utf-8')
+    digest = hashlib.md5(path + b'\n' + response['ETag'].encode('ascii')).hexdigest()
+    key = CACHE_KEY.format(encoding=encoding, digest=digest)
+    content = cache.get(key)
+    if content is None:
+        content = compress(response.content, encoding)
+        cache.set(key, content, getattr(settings, 'COMPRESSED_RESPONSE_TIMEOUT', 60 * 60 * 24))
+    return content
+
+
+class CompressedResponseMiddleware(MiddlewareMixin):
+    """
+    Like django's GZipMiddleware, but with brotli, and with each response version compressed only once.
+    Streamed responses are left alone, compressing them would hold back what's already been rendered.
+
+    Every encoding of a response shares its ETag, so ETags can only be weak ones. They're made weak on
+    every response, 304s and uncompressed ones included, so a client always gets back the validator it
+    sent.
+    """
+
+    def process_response(self, request, response):
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        if response.streaming or response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+        if len(response.content) < MIN_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        content = compressed_content(request, response, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,152 @@
+"""
+A registry of which rows of other models (Events, People, House Teams, Ape Classes, Videos) each widget's
+content was built from.
+
+A widget's cache key only changes when the widget itself is saved, but most group and focus widgets show
+data that lives on other models. When a widget is serialized it records what it was built from, and when
+one of those rows is saved or deleted the widgets that depend on it get a new content version, which is
+part of their cache key. Pages build their cache key from their widgets' keys, so only the pages showing
+an affected widget get re-rendered.
+
+Widgets whose items are picked by a query (upcoming events, all open classes, ...) rather than by hand
+depend on the whole item model, since a new or edited row could join them at any time.
+
+Each model also has a content version, the time any of its rows last changed, used to build cheap
+validators for API responses (ETags, Last-Modified).
+
+Everything lives in the cache, so the registry is shared by every worker using it. Workers rendering
+at the same time mustn't lose each other's widgets, so nothing is read, changed and written back: each
+dependency has a counter, and each widget depending on it gets a slot of its own, numbered by an atomic
+incr of the counter. A widget remembers its slots, and gives up the ones for rows it's no longer built
+from.
+"""
+import time
+
+from django.core.cache import cache
+from django.dispatch import Signal
+
+ANY = '*'
+# {dependency: slot} for each of a widget's dependencies
+DEPENDENCIES_KEY = 'widget_dependency_slots:{widget_id}'
+# how many slots a dependency has handed out, and the widget in each slot
+SLOTS_KEY = 'widget_dependent_slots:{dependency}'
+DEPENDENT_KEY = 'widget_dependent:{dependency}:{slot}'
+VERSION_KEY = 'widget_version:{widget_id}'
+MODEL_VERSION_KEY = 'model_version:{label}'
+
+# sent with the ids of widgets whose content just changed
+widgets_invalidated = Signal(providing_args=['widget_ids'])
+
+
+def dependency_key(dependency):
+    """
+    A dependency can be a model instance, a (model, pk) pair, or a model class meaning any row of that model.
+    """
+    if isinstance(dependency, tuple):
+        model, pk = dependency
+    elif isinstance(dependency, type):
+        model, pk = dependency, ANY
+    else:
+        model, pk = type(dependency), dependency.pk
+    return '{}:{}'.format(model._meta.label_lower, pk)
+
+
+def record(widget, dependencies):
+    """
+    Records the rows widget was just built from.
+    """
+    if not widget.pk:
+        return
+    dependency_keys = frozenset(dependency_key(d) for d in dependencies)
+    key = DEPENDENCIES_KEY.format(widget_id=widget.pk)
+    recorded = cache.get(key) or {}
+    if frozenset(recorded) == dependency_keys:
+        return
+
+    slots = {d: recorded[d] for d in dependency_keys if d in recorded}
+    for dependency in dependency_keys - frozenset(recorded):
+        slots[dependency] = add_dependent(dependency, widget.pk)
+    cache.delete_many([
+        DEPENDENT_KEY.format(dependency=d, slot=slot) for d, slot in recorded.items() if d not in dependency_keys
+    ])
+    cache.set(key, slots, timeout=None)
+
+
+def add_dependent(dependency, widget_id):
+    """
+    Gives widget_id a slot of its own among the dependents of dependency, returning the slot.
+    """
+    slots_key = SLOTS_KEY.format(dependency=dependency)
+    cache.add(slots_key, 0, timeout=None)
+    try:
+        slot = cache.incr(slots_key)
+    except ValueError:
+        # evicted between the add and the incr, just start counting again
+        cache.add(slots_key, 0, timeout=None)
+        slot = cache.incr(slots_key)
+    cache.set(DEPENDENT_KEY.format(dependency=dependency, slot=slot), widget_id, timeout=None)
+    return slot
+
+
+def dependents(dependency_keys):
+    """
+    The ids of the widgets depending on any of the given dependencies.
+    """
+    slot_keys = [SLOTS_KEY.format(dependency=d) for d in dependency_keys]
+    counts = cache.get_many(slot_keys)
+    keys = [
+        DEPENDENT_KEY.format(dependency=d, slot=slot)
+        for d, slots_key in zip(dependency_keys, slot_keys) for slot in range(1, counts.get(slots_key, 0) + 1)
+    ]
+    return set(cache.get_many(keys).values())
+
+
+def invalidate(model, pk):
+    """
+    Gives every widget built from the given row (or from any row of model) a new content version.
+    """
+    touch(model)
+    widget_ids = dependents([dependency_key((model, pk)), dependency_key(model)])
+    invalidate_widgets(widget_ids)
+    return widget_ids
+
+
+def touch(model):
+    """
+    Gives model a new content version without touching its widgets, for changes that don't show up in them.
+    """
+    cache.set(MODEL_VERSION_KEY.format(label=model._meta.label_lower), time.time(), timeout=None)
+
+
+def invalidate_widgets(widget_ids):
+    version = time.time()
+    cache.set_many({VERSION_KEY.format(widget_id=i): version for i in widget_ids}, timeout=None)
+    widgets_invalidated.send(sender=None, widget_ids=widget_ids)
+
+
+def widget_version(widget_id):
+    return cache.get(VERSION_KEY.format(widget_id=widget_id), '')
+
+
+def load_versions(widgets):
+    """
+    Fetches the content versions of many widgets at once, rather than one cache lookup per widget.
+    """
+    keys = {VERSION_KEY.format(widget_id=w.pk): w for w in widgets}
+    versions = cache.get_many(list(keys))
+    for key, widget in keys.items():
+        widget.content_version = versions.get(key, '')
+
+
+def model_versions(models):
+    """
+    The content versions of the given models, in order. A model whose version isn't known (it hasn't
+    changed since the cache was cleared) is versioned from now on, to be safe.
+    """
+    keys = [MODEL_VERSION_KEY.format(label=model._meta.label_lower) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
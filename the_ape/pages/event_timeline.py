@@ -0,0 +1,77 @@
+"""
+Every upcoming event, sorted by start time, so the upcoming events widgets (see EventsWidget) find the
+shows in their window with a binary search instead of a query each.
+
+The timeline is built with one query and kept in the shared cache, along with the version it was built
+at, and each process keeps its own copy too (see pages.shared_cache.LocalCopy). Saving or deleting an event (or a banner, which events
+include) gives the timeline a new version (see pages.signals), and it's rebuilt the next time it's used.
+Shows that start after it was built are skipped by the search, and dropped from it at the next rebuild.
+"""
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from events.models import Event
+from pages import shared_cache
+
+VERSION_KEY = 'event_timeline_version'
+TIMELINE_KEY = 'event_timeline'
+
+
+def build(version):
+    """
+    The events yet to start, in order, with the relations the widgets' item_data() follows.
+    """
+    from pages.models import EventsWidget
+
+    events = Event.objects.filter(start_time__gt=timezone.now()).order_by('start_time', 'pk')
+    timeline = (version, list(EventsWidget.with_item_relations(events)))
+    cache.set(TIMELINE_KEY, timeline, timeout=None)
+    return timeline
+
+
+def load(version):
+    # another process may have built this version already
+    shared = cache.get(TIMELINE_KEY)
+    if shared is None or shared[0] != version:
+        shared = build(version)
+    events = shared[1]
+    return [event.start_time for event in events], events
+
+
+_timeline = shared_cache.LocalCopy(VERSION_KEY, load)
+
+
+def timeline():
+    """
+    The start times of the upcoming events, and the events, both in order.
+    """
+    return _timeline.get()
+
+
+def between(start, end=None):
+    """
+    The events starting after start and before end (if given), in order. start shouldn't be earlier
+    than the time the timeline was built, which it never is when it's now.
+    """
+    start_times, events = timeline()
+    first = bisect_right(start_times, start)
+    last = bisect_left(start_times, end) if end is not None else len(events)
+    return events[first:last]
+
+
+def next_start(after, inclusive=False):
+    """
+    When the first show starting after (or at, if inclusive) the given time starts, or None.
+    """
+    start_times, events = timeline()
+    i = bisect_left(start_times, after) if inclusive else bisect_right(start_times, after)
+    return start_times[i] if i < len(start_times) else None
+
+
+def invalidate():
+    """
+    Has every process rebuild the timeline.
+    """
+    _timeline.invalidate()
@@ -0,0 +1,89 @@
+"""
+Selling the seats of events and classes (see availability_fields on their models), without overselling.
+
+Seats are taken, or held for a buyer while they check out, with a single UPDATE that only matches the
+row if there's still room (counting the seats taken and held), so two checkouts racing for the last seat
+can't both get it, and no sale is lost to another one saving over it. Held seats are then sold, or given
+back, the same way. These report whether they changed anything rather than raising, like
+SquarePayment.charge().
+
+Updating rows this way doesn't send post_save. Nothing widgets or the event timeline are built from
+changes when seats do (widgets' items get their seats from the counters, see
+page_tags.load_availability), so once the current transaction commits only the row's seat counters are
+loaded again, and its model gets a new content version for the API responses that include the seats.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+
+from pages import availability, dependencies
+
+
+def take(instance, count=1):
+    """
+    Takes count seats in the given event or class, if there are that many left. Returns whether it did,
+    and updates the instance's counts if so.
+    """
+    taken_field, held_field, limit_field = type(instance).availability_fields
+    return _add_if_room(instance, taken_field, count)
+
+
+def hold(instance, count=1):
+    """
+    Holds count seats in the given event or class for someone checking out, if there are that many left.
+    """
+    taken_field, held_field, limit_field = type(instance).availability_fields
+    return _add_if_room(instance, held_field, count)
+
+
+def release(instance, count=1, held=False):
+    """
+    Gives back count seats taken (or held) in the given event or class, e.g. when a payment for them fails.
+    """
+    count = int(count)
+    taken_field, held_field, limit_field = type(instance).availability_fields
+    field = held_field if held else taken_field
+    return _update(instance, count, Q(**{field + '__gte': count}), **{field: F(field) - count})
+
+
+def sell_held(instance, count=1):
+    """
+    Turns count held seats into taken ones.
+    """
+    count = int(count)
+    taken_field, held_field, limit_field = type(instance).availability_fields
+    return _update(instance, count, Q(**{held_field + '__gte': count}),
+                   **{held_field: F(held_field) - count, taken_field: F(taken_field) + count})
+
+
+def _add_if_room(instance, field, count):
+    count = int(count)
+    taken_field, held_field, limit_field = type(instance).availability_fields
+    room = Q(**{limit_field + '__isnull': True}) | \
+        Q(**{limit_field + '__gte': F(taken_field) + F(held_field) + count})
+    return _update(instance, count, room, **{field: F(field) + count})
+
+
+def _update(instance, count, condition, **changes):
+    if count < 1:
+        return False
+    model = type(instance)
+    if not model._base_manager.filter(condition, pk=instance.pk).update(**changes):
+        return False
+    seats_changed(model, instance.pk, instance)
+    return True
+
+
+def seats_changed(model, pk, instance=None):
+    """
+    Catches up with the seats of the given event or class having changed without it being saved.
+    """
+    if instance is not None:
+        counts = model._base_manager.values_list(*model.availability_fields).get(pk=pk)
+        for field, value in zip(model.availability_fields, counts):
+            setattr(instance, field, value)
+
+    def forget():
+        availability.forget_counts(model, pk)
+        dependencies.touch(model)
+
+    transaction.on_commit(forget)
@@ -0,0 +1,88 @@
+"""
+Times the JSON encoders in pages.encoders against each other on a page's data, e.g.
+
+    ./manage.py benchmark_json --page classes
+    ./manage.py benchmark_json --items 500
+
+Without --page, it uses a made up page of events, classes & people shaped like what the API serves.
+"""
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from pages import encoders
+from pages.models import Page
+
+ENCODERS = ['pages.encoders.DjangoEncoder', 'pages.encoders.CompactEncoder', 'pages.encoders.UTF8Encoder']
+
+
+def made_up_page(items):
+    now = timezone.localtime(timezone.now())
+    teacher = {
+        "id": 1, "name": "Funnyboy Jones", "bio": "Funny. " * 60, "teaches": True, "performs": True,
+        "path": "/api/people/1.json", "url": "/people/1/", "image_url": "/media/headshots/jones.jpg",
+    }
+    events = [{
+        "id": i, "name": "Show {}".format(i), "path": "/api/events/{}.json".format(i),
+        "image": "/media/banners/show.jpg", "ticket_price": Decimal('10.00'), "is_free": False,
+        "start_time": now + timedelta(days=i, minutes=i), "bio": "A very funny show. " * 30,
+    } for i in range(items)]
+    classes = [{
+        "id": i, "name": "Improv {}".format(i), "path": "/api/classes/{}.json".format(i),
+        "image": "/media/banners/improv.jpg", "type": "IMPROV", "bio": "Yes, and. " * 40,
+        "start_date": now + timedelta(days=i), "class_length": 8, "num_sessions": 8,
+        "price": Decimal('300.00'), "is_free": False, "teacher": teacher,
+    } for i in range(items)]
+    people = [dict(teacher, id=i, path="/api/people/{}.json".format(i)) for i in range(items)]
+    return {
+        "name": "Home",
+        "background": {"type": "solid_color", "color": "#ffffff"},
+        "widgets": [
+            {"id": 1, "type": "gallery", "item_type": "event", "items": events},
+            {"id": 2, "type": "gallery", "item_type": "ape_class", "items": classes},
+            {"id": 3, "type": "gallery", "item_type": "person", "items": people},
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares how fast the JSON encoders in pages.encoders encode a page"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', default=None, help="Slug or id of a page to encode")
+        parser.add_argument('--items', type=int, default=200,
+                            help="Items per widget on the made up page (default: 200)")
+        parser.add_argument('--number', type=int, default=20, help="Times to encode the page with each encoder")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Times to repeat that, the fastest is reported (default: 5)")
+
+    def get_data(self, page):
+        if page is None:
+            return made_up_page(self.items)
+        try:
+            page = Page.objects.get(pk=page) if page.isdigit() else Page.objects.get(slug=page)
+        except Page.DoesNotExist:
+            raise CommandError("No page {}".format(page))
+        return page.to_data()
+
+    def handle(self, *args, **options):
+        self.items = options['items']
+        data = self.get_data(options['page'])
+        paths = list(ENCODERS)
+        configured = getattr(settings, 'API_JSON_ENCODER', encoders.DEFAULT_ENCODER)
+        if configured not in paths:
+            paths.append(configured)
+        for path in paths:
+            encoder = import_string(path)()
+            size = len(encoder.encode(data))
+            # the fastest run is the one least disturbed by everything else the machine is doing
+            seconds = min(timeit.repeat(lambda: encoder.encode(data), number=options['number'],
+                                        repeat=options['repeat']))
+            self.stdout.write("{:<40} {:>8.2f} ms {:>10} bytes".format(
+                path, seconds * 1000 / options['number'], size
+            ))
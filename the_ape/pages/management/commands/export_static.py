@@ -0,0 +1,173 @@
+"""
+Exports every public page, event, class, person and house team (whatever's in the sitemaps) to static
+HTML, along with its JSON from the API, in a directory tree nginx can serve without touching Django:
+
+    location / {
+        root <STATIC_EXPORT_ROOT>;
+        gzip_static on;  # every file has its .gz (and .br, with brotli installed) alongside it
+        brotli_static on;
+        if ($cookie_sessionid) { proxy_pass http://django; }  # logged in visitors get their own pages
+        try_files $uri $uri/index.html @django;
+    }
+
+Exports are incremental: each URL's ETag is kept in a manifest, and a URL is only rendered & written
+again if the view no longer answers its ETag with a 304 (see pages.views). Anything that's dropped out
+of the sitemaps is removed.
+"""
+from __future__ import unicode_literals
+
+import json
+import os
+from collections import OrderedDict
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils.six.moves.urllib.parse import urlsplit
+
+from pages import compression
+from pages.models import Page
+
+MANIFEST_NAME = '.export_manifest.json'
+
+_client = None
+
+
+def export_path(url):
+    """
+    Where in the export the file for url goes, e.g. /shows/ -> shows/index.html, /api/shows.json -> api/shows.json
+    """
+    path = urlsplit(url).path.strip('/')
+    if not os.path.splitext(path)[1]:
+        path = os.path.join(path, 'index.html')
+    return path
+
+
+def export_url(args):
+    """
+    Renders url (as an anonymous visitor) into output_dir, unless it still matches etag.
+    Returns (url, etag, path written or None, status code).
+    """
+    global _client
+    url, output_dir, host, etag = args
+    if _client is None:
+        _client = Client(HTTP_HOST=host)
+    _client.cookies.clear()  # every url is rendered for a first time visitor
+
+    headers = {'static_export': True}
+    if etag:
+        headers['HTTP_IF_NONE_MATCH'] = etag
+    try:
+        response = _client.get(url, follow=True, secure=True, **headers)
+    except Exception:
+        # the test client re-raises whatever went wrong in the view, one broken page shouldn't stop the export
+        return url, None, None, 500
+    if response.status_code == 304:
+        return url, etag, None, 304
+    if response.status_code != 200:
+        return url, None, None, response.status_code
+
+    path = export_path(response.redirect_chain[-1][0] if response.redirect_chain else url)
+    full_path = os.path.join(output_dir, path)
+    if not os.path.isdir(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+    write_file(full_path, response.content)
+    for encoding in compression.encodings():
+        write_file(full_path + compression.FILE_SUFFIXES[encoding], compression.compress(response.content, encoding))
+    return url, response.get('ETag'), path, 200
+
+
+def write_file(full_path, content):
+    temp_path = full_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.rename(temp_path, full_path)
+
+
+class Command(BaseCommand):
+    help = "Exports the public site to static html & json files nginx can serve directly"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.STATIC_EXPORT_ROOT,
+                            help="Directory to export to (default: STATIC_EXPORT_ROOT)")
+        parser.add_argument('--host', default=None,
+                            help="Host to render pages as (default: the current Site's domain)")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Number of processes to render pages with")
+        parser.add_argument('--full', action='store_true',
+                            help="Render everything again, not just what's changed since the last export")
+
+    def get_urls(self):
+        from the_ape.urls import sitemaps
+
+        urls = ['/']
+        for sitemap_class in sitemaps.values():
+            sitemap = sitemap_class()
+            for item in sitemap.items():
+                urls += [sitemap.location(item), item.get_api_url()]
+                if isinstance(item, Page) and item.slug:
+                    urls.append(reverse('page', kwargs={'page_slug': item.slug}))
+                if isinstance(item, Page) and item.server_rendered_widgets is not None:
+                    # widgets the page loads as the visitor scrolls
+                    for widget in item.active_widgets()[item.server_rendered_widgets:]:
+                        urls += [reverse('widget_wrapper', kwargs={'widget_id': widget.pk}),
+                                 reverse('widget', kwargs={'widget_id': widget.pk})]
+        return list(OrderedDict.fromkeys(urls))
+
+    def handle(self, *args, **options):
+        output_dir = options['output']
+        host = options['host'] or Site.objects.get_current().domain
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path) and not options['full']:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        urls = self.get_urls()
+        jobs = [(url, output_dir, host, manifest.get(url, {}).get('etag')) for url in urls]
+        if options['workers'] > 1:
+            # forked workers can't share the parent's database connections
+            connections.close_all()
+            pool = Pool(options['workers'])
+            try:
+                results = pool.map(export_url, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [export_url(job) for job in jobs]
+
+        exported = {}
+        counts = {'written': 0, 'unchanged': 0, 'failed': 0}
+        for url, etag, path, status in results:
+            if status == 304:
+                exported[url] = manifest[url]
+                counts['unchanged'] += 1
+            elif status == 200:
+                exported[url] = {'etag': etag, 'path': path}
+                counts['written'] += 1
+            else:
+                self.stderr.write("{} returned {}".format(url, status))
+                counts['failed'] += 1
+                if url in manifest:
+                    # keep serving the last good export
+                    exported[url] = manifest[url]
+
+        # remove whatever isn't public any more
+        exported_paths = {entry['path'] for entry in exported.values()}
+        for url, entry in manifest.items():
+            if url not in exported and entry['path'] not in exported_paths:
+                full_path = os.path.join(output_dir, entry['path'])
+                for suffix in [''] + list(compression.FILE_SUFFIXES.values()):
+                    if os.path.exists(full_path + suffix):
+                        os.remove(full_path + suffix)
+
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        with open(manifest_path, 'w') as f:
+            json.dump(exported, f, indent=2, sort_keys=True)
+        self.stdout.write("Exported {written} urls, {unchanged} unchanged, {failed} failed".format(**counts))
@@ -0,0 +1,17 @@
+"""
+Publishes fresh snapshots of every page (see pages.snapshots). Run it after a deploy that changes
+what pages serialize to.
+"""
+from django.core.management.base import BaseCommand
+
+from pages import snapshots
+from pages.models import Page
+
+
+class Command(BaseCommand):
+    help = "Publishes fresh snapshots of every page"
+
+    def handle(self, *args, **options):
+        for page in Page.objects.all():
+            snapshots.publish(page)
+            self.stdout.write("Published {}".format(page))
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-18 09:27
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0017_pressclippingwidget_background_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='cache_timeout',
+            field=models.PositiveIntegerField(blank=True, help_text="Seconds to cache this page's rendered html for. Leave blank to use the site default, 0 disables caching.", null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-18 09:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0018_page_cache_timeout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(blank=True, null=True)),
+                ('data', models.TextField()),
+                ('native', models.BinaryField()),
+                ('etag', models.CharField(max_length=32)),
+                ('generated', models.DateTimeField()),
+                ('expires', models.DateTimeField(blank=True, help_text='When the page next changes by itself (see pages.schedule)', null=True)),
+                ('page', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='pages.Page')),
+            ],
+        ),
+    ]
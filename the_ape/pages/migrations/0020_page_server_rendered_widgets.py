@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.23 on 2026-10-18 09:46
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0019_pagesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='server_rendered_widgets',
+            field=models.PositiveIntegerField(blank=True, help_text='Number of widgets sent with the page, the rest are loaded as the visitor scrolls down to them. Leave blank to send them all.', null=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""
+Minifies html once, where it's produced, rather than running htmlmin over every response:
+
+- the site's page and widget templates are minified as they're loaded (see Loader, set up in TEMPLATES)
+- cached fragments of pages & widgets (see pages.cache) are minified as they're rendered, which takes
+  care of the text, bios etc that come from the database
+
+so the views in pages.views tell htmlmin's middleware their responses are minified already. Other
+apps' views, and the admin's and emails' templates, are left to htmlmin as before. Like htmlmin, this
+is on if HTML_MINIFY is (default: not DEBUG).
+
+    MINIFIED_TEMPLATES      prefixes of the names of the templates minified as they're loaded
+
+Minifying here only collapses runs of whitespace and drops comments, which doesn't need the whole
+document parsed, so it works on fragments and template source alike. <pre>, <textarea> and <script>
+are left alone, as are conditional comments.
+"""
+import re
+
+from django.conf import settings
+from django.template import Origin
+from django.template.loaders.base import Loader as BaseLoader
+
+re_untouched = re.compile(r'(<(pre|textarea|script)\b.*?</\2\s*>|<!--\[if.*?<!\[endif\]-->)',
+                          re.DOTALL | re.IGNORECASE)
+re_comment = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+re_space = re.compile(r'\s+')
+re_space_between_tags = re.compile(r'>\s+<')
+
+DEFAULT_MINIFIED_TEMPLATES = ('base.html', 'pages/', 'widgets/')
+
+
+def is_enabled():
+    return getattr(settings, 'HTML_MINIFY', not settings.DEBUG)
+
+
+def is_minified_template(template_name):
+    return (template_name or '').startswith(tuple(getattr(settings, 'MINIFIED_TEMPLATES', DEFAULT_MINIFIED_TEMPLATES)))
+
+
+def minify(html):
+    parts = re_untouched.split(html)
+    minified = []
+    # split() gives us [text, untouched block, tag name, text, untouched block, tag name, ..., text]
+    for i in range(0, len(parts), 3):
+        text = re_comment.sub('', parts[i])
+        minified.append(re_space_between_tags.sub('> <', re_space.sub(' ', text)))
+        if i + 1 < len(parts):
+            minified.append(parts[i + 1])
+    return ''.join(minified)
+
+
+class Loader(BaseLoader):
+    """
+    Wraps other template loaders, minifying the page and widget templates they load, e.g.
+
+        'loaders': [('pages.minify.Loader', ['django.template.loaders.filesystem.Loader', ...])]
+
+    Put it inside django's cached loader to minify each template just once.
+    """
+
+    def __init__(self, engine, loaders):
+        super(Loader, self).__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(template_name):
+                minifying_origin = Origin(name=origin.name, template_name=origin.template_name, loader=self)
+                minifying_origin.source_origin = origin
+                yield minifying_origin
+
+    def get_contents(self, origin):
+        source_origin = origin.source_origin
+        contents = source_origin.loader.get_contents(source_origin)
+        if is_enabled() and origin.name.endswith('.html') and is_minified_template(origin.template_name):
+            return minify(contents)
+        return contents
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
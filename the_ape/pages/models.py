@@ -1,5 +1,8 @@
+import binascii
 import os
 import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from hashlib import md5
 
@@ -12,6 +15,7 @@ from django.core.exceptions import ValidationError
 from django.core.management import call_command
 from django.core.urlresolvers import reverse
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 from django.utils import timezone
@@ -20,6 +24,7 @@ from model_utils.managers import InheritanceManager
 
 from classes.models import ApeClass
 from events.models import Event
+from pages import dependencies, event_timeline, schedule
 from pages.fields import SortedManyToManyField, ColorField
 from people.models import Person, HouseTeam
 
@@ -35,6 +40,46 @@ def to_cache_key(vals):
     return cache_key
 
 
+def encode_cursor(offset):
+    """
+    An opaque cursor for paging through a group widget's items, so what's in it can change later.
+    """
+    return urlsafe_b64encode('o:{}'.format(offset).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    The offset an encode_cursor() cursor stands for, raising ValueError for anything else.
+    """
+    try:
+        kind, _, offset = urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').partition(':')
+    except (TypeError, UnicodeError, binascii.Error):
+        raise ValueError("Bad cursor")
+    if kind != 'o' or not offset.isdigit():
+        raise ValueError("Bad cursor")
+    return int(offset)
+
+
+def order_for_paging(items):
+    """
+    Items in their usual order, with ties broken by pk so pages never overlap or skip anything.
+    """
+    ordering = list(items.query.order_by or items.model._meta.ordering)
+    return items.order_by(*(ordering + ['pk']))
+
+
+def prefetch_data(widgets):
+    """
+    Fetches everything the given widgets' to_data() needs up front, in a few batched queries per widget
+    type, so that serializing a page costs about the same number of queries however many items it shows.
+    """
+    widgets_by_type = OrderedDict()
+    for widget in widgets:
+        widgets_by_type.setdefault(type(widget), []).append(widget)
+    for widget_type, typed_widgets in widgets_by_type.items():
+        widget_type.prefetch_data(typed_widgets)
+
+
 class WidgetManager(InheritanceManager):
     def active(self):
         return self.exclude(
@@ -83,6 +128,9 @@ class Widget(AbstractWidget):
     end_date = models.DateTimeField(null=True, blank=True, help_text="Time at which this widget will turn off")
     width = models.CharField(max_length=100, choices=WIDTH_CHOICES, default="full")
 
+    # the relations to_data() follows, so they can be prefetched for many widgets at once
+    data_prefetch_related = []
+
     @staticmethod
     def autocomplete_search_fields():
         return ("id__iexact", "name__icontains")
@@ -90,6 +138,14 @@ class Widget(AbstractWidget):
     class Meta:
         ordering = ['name']
 
+    @classmethod
+    def prefetch_data(cls, widgets):
+        """
+        Batch-loads the related rows to_data() uses for the given widgets, all of this type (see prefetch_data).
+        """
+        if cls.data_prefetch_related:
+            prefetch_related_objects(widgets, *cls.data_prefetch_related)
+
     def get_subclass(self):
         if type(self) != Widget:
             return self
@@ -115,11 +171,31 @@ class Widget(AbstractWidget):
             return False
         return True
 
+    def next_change(self, now=None):
+        """
+        The next time this widget's content will change by itself, or None if it won't (see pages.schedule)
+        """
+        now = now or timezone.now()
+        return schedule.earliest([self.start_date, self.end_date], now)
+
+    @property
+    def content_version(self):
+        """
+        Changes whenever something this widget's content was built from changes (see pages.dependencies)
+        """
+        if not hasattr(self, '_content_version'):
+            self._content_version = dependencies.widget_version(self.id)
+        return self._content_version
+
+    @content_version.setter
+    def content_version(self, version):
+        self._content_version = version
+
     @property
     def cache_key(self):
         if not hasattr(self, '_cache_key'):
             if self.id:
-                self._cache_key = to_cache_key(["widget", self.id, self.last_modified])
+                self._cache_key = to_cache_key(["widget", self.id, self.last_modified, self.content_version])
             else:
                 self._cache_key = None
         return self._cache_key
@@ -213,6 +289,15 @@ class Page(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
     draft = models.BooleanField(default=False)
+    cache_timeout = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Seconds to cache this page's rendered html for. Leave blank to use the site default, 0 disables caching."
+    )
+    server_rendered_widgets = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Number of widgets sent with the page, the rest are loaded as the visitor scrolls down to them. "
+                  "Leave blank to send them all."
+    )
 
     # page color
     background_gradient = models.NullBooleanField()
@@ -272,7 +357,18 @@ class Page(models.Model):
     def cache_key(self):
         return to_cache_key(["page", self.id, self.last_modified])
 
-    def to_data(self):
+    def next_change(self, now=None):
+        """
+        The next time the rendered page will change by itself, i.e. the earliest time one of its
+        widgets turns on/off or changes its content (see pages.schedule)
+        """
+        now = now or timezone.now()
+        return schedule.earliest([w.next_change(now) for w in self.all_widgets()], now)
+
+    def to_data(self, **item_options):
+        """
+        item_options (items_limit, items_cursor, item_fields) are passed on to the page's group widgets.
+        """
         data = {
             'name': self.name,
             'background': self.background_data()
@@ -282,15 +378,33 @@ class Page(models.Model):
             'button_color',
             'button_text_color',
             'nav_bar_color',
-            'nav_bar_text_color'
+            'nav_bar_text_color',
+            'server_rendered_widgets',
         ]
         for field in direct_data_fields:
             data[field] = getattr(self, field, None)
-        widgets = [w for w in self.widgets if w.is_active]
 
-        data['widgets'] = [widget.get_subclass().to_data() for widget in widgets]
+        widgets = [widget.get_subclass() for widget in self.active_widgets()]
+        prefetch_data(widgets)
+        data['widgets'] = [
+            widget.to_data(**item_options) if isinstance(widget, GroupWidget) else widget.to_data()
+            for widget in widgets
+        ]
         return data
 
+    def active_widgets(self):
+        """
+        The widgets currently turned on for this page, in order. These are the widgets to_data() serializes.
+        """
+        if not hasattr(self, '_active_widgets'):
+            self._active_widgets = [w for w in self.all_widgets() if w.is_active]
+        return self._active_widgets
+
+    def all_widgets(self):
+        if not hasattr(self, '_all_widgets'):
+            self._all_widgets = self.widgets
+        return self._all_widgets
+
     @property
     def widgets(self):
         widgets = list(self.widgets_base.select_subclasses().order_by('page_to_widgets__sort_order'))
@@ -324,6 +438,30 @@ class Page(models.Model):
         return self.name
 
 
+class PageSnapshot(models.Model):
+    """
+    A page's data as it was last published (see pages.snapshots), so serving a page doesn't mean
+    serializing it all over again.
+
+    data is the JSON the API serves as is, native is the same data with its datetimes, Decimals, etc
+    intact (pickled) for the HTML views, along with what they need to cache the rendered page.
+    """
+    page = models.OneToOneField(Page, related_name='snapshot', on_delete=models.CASCADE)
+    slug = models.SlugField(null=True, blank=True, db_index=True)
+    data = models.TextField()
+    native = models.BinaryField()
+    etag = models.CharField(max_length=32)
+    generated = models.DateTimeField()
+    expires = models.DateTimeField(null=True, blank=True,
+                                   help_text="When the page next changes by itself (see pages.schedule)")
+
+    def is_expired(self, now=None):
+        return self.expires is not None and self.expires <= (now or timezone.now())
+
+    def __str__(self):
+        return u"Snapshot of {}".format(self.page_id)
+
+
 class PageLinkMixin(models.Model):
     """
     Mixin which provides the fields necessary to generically link to 
@@ -406,6 +544,13 @@ class GroupWidget(Widget):
     Base class for a group of items.
     """
     group_type = None
+    # the many to many field holding the items picked by hand
+    handpicked_field = None
+    # the relations item_data() follows, loaded along with the items
+    item_select_related = []
+    item_prefetch_related = []
+    # the models items are built from, whose content versions (see pages.dependencies) validate a page of items
+    item_version_models = []
 
     class DefaultMeta:
         required_fields = ['display_type']
@@ -413,17 +558,47 @@ class GroupWidget(Widget):
     class Meta:
         abstract = True
 
-    def to_data(self, *args, **kwargs):
+    def to_data(self, items_limit=None, items_cursor=None, item_fields=None, *args, **kwargs):
+        """
+        items_limit and items_cursor page through the items (items_cursor in the data picks up where the
+        page left off, and is None on the last page), item_fields picks which fields of item_data() each item
+        gets. Only the columns those fields are read from are loaded.
+        """
         data = super(GroupWidget, self).to_data(*args, **kwargs)
+        partial = items_limit is not None or items_cursor is not None or item_fields is not None
+        items = self.items
+        is_query = isinstance(items, models.QuerySet)
+        if item_fields is not None and is_query:
+            items = self.only_item_fields(items, item_fields)
+
+        next_cursor = None
+        if items_limit is not None or items_cursor is not None:
+            offset = decode_cursor(items_cursor) if items_cursor is not None else 0
+            if is_query:
+                items = order_for_paging(items)
+            if items_limit is None:
+                items = list(items[offset:])
+            else:
+                items = list(items[offset:offset + items_limit + 1])
+                if len(items) > items_limit:
+                    items = items[:items_limit]
+                    next_cursor = encode_cursor(offset + items_limit)
+            data["items_cursor"] = next_cursor
+        else:
+            items = list(items)
+
         data.update({
             "type": self.display_type,
             "item_type": self.item_type(),
             "items": [
-                self.item_data(item) for item in self.items.all()
+                self.item_data(item, item_fields) for item in items
             ]
         })
         if self.group_type:
             data["group_type"] = self.group_type
+        if not partial:
+            # a page or a few fields of the items aren't everything this widget is built from
+            dependencies.record(self, self.item_dependencies(items))
         return data
 
     def item_type(self):
@@ -431,15 +606,78 @@ class GroupWidget(Widget):
 
     @property
     def items(self):
+        """
+        A queryset of the items, or a list of them already in the order they're paged in.
+        """
         raise NotImplementedError()
 
-    def item_data(self, item):
-        data = {
-            "id": item.id,
-            "name": item.name,
-            "path": item.get_api_url(),
+    @property
+    def handpicked(self):
+        """
+        Whether this widget's items were chosen by hand, rather than by a query over the item model
+        """
+        return bool(self.pk and getattr(self, self.handpicked_field).exists())
+
+    @classmethod
+    def with_item_relations(cls, items):
+        return items.select_related(*cls.item_select_related).prefetch_related(*cls.item_prefetch_related)
+
+    @classmethod
+    def only_item_fields(cls, items, fields):
+        """
+        Restricts items to the columns (and relations) the given item_data() fields are read from.
+        """
+        columns = {'pk'}
+        for name, (field_columns, value) in cls.item_fields().items():
+            if name in fields:
+                columns.update(field_columns)
+        relations = {column.split('__')[0] for column in columns}
+        select_related = [r for r in cls.item_select_related if r in relations]
+        prefetch_related = [r for r in cls.item_prefetch_related if r.split('__')[0] in relations]
+        items = items.select_related(None).prefetch_related(None)
+        return items.select_related(*select_related).prefetch_related(*prefetch_related).only(*columns)
+
+    @classmethod
+    def prefetch_data(cls, widgets):
+        """
+        Loads the handpicked items of all the given widgets, and what their item_data() needs, in one go.
+        """
+        super(GroupWidget, cls).prefetch_data(widgets)
+        items = cls.with_item_relations(cls.items_model._default_manager.all())
+        prefetch_related_objects(widgets, models.Prefetch(cls.handpicked_field, queryset=items))
+
+    def handpicked_items(self):
+        handpicked = getattr(self, self.handpicked_field)
+        if self.handpicked_field in getattr(self, '_prefetched_objects_cache', {}):
+            return handpicked.all()
+        return self.with_item_relations(handpicked.all())
+
+    def item_dependencies(self, items):
+        """
+        What this widget's items were built from. Widgets whose items come from a query depend on the
+        whole item model, since any new or edited row could end up in them.
+        """
+        item_dependencies = list(items)
+        if not self.handpicked:
+            item_dependencies.append(self.items_model)
+        return item_dependencies
+
+    @classmethod
+    def item_fields(cls):
+        """
+        The fields item_data() gives for each item, as {name: (the columns it's read from, a function reading it)}
+        """
+        return OrderedDict([
+            ("id", (['id'], lambda item: item.id)),
+            ("name", (['name'], lambda item: item.name)),
+            ("path", (['id'], lambda item: item.get_api_url())),
+        ])
+
+    def item_data(self, item, fields=None):
+        return {
+            name: value(item) for name, (columns, value) in self.item_fields().items()
+            if fields is None or name in fields
         }
-        return data
 
 
 class EventsWidget(GroupWidget):
@@ -479,33 +717,57 @@ class EventsWidget(GroupWidget):
         })
         return data
 
+    items_model = Event
+    handpicked_field = 'events'
+    item_select_related = ['banner']
+    item_version_models = [Event, Widget]
+
     @property
     def items(self):
-        events = Event.objects.all()
+        if self.handpicked:
+            return self.handpicked_items()
 
         if self.upcoming_events:
-            events = events.filter(start_time__gt=timezone.now())
-
+            # shared by every upcoming events widget, see pages.event_timeline
+            now = timezone.now()
+            window_end = None
             if self.upcoming_events_window is not None:
-                window_end = timezone.now() + timedelta(days=int(self.upcoming_events_window))
-                events = events.filter(start_time__lt=window_end)
-            events = events.order_by('start_time')
+                window_end = now + timedelta(days=int(self.upcoming_events_window))
+            return event_timeline.between(now, window_end)
+        return self.with_item_relations(Event.objects.all().distinct())
 
-        if self.pk and self.events.exists():
-            handpicked = Event.objects.filter(events_widgets=self)
-            events = handpicked
-        return events.distinct()
-
-    def item_data(self, item):
-        data = super(EventsWidget, self).item_data(item)
-        data.update({
-            "image": item.banner.image.url,
-            "ticket_price": item.ticket_price,
-            "is_free": item.is_free,
-            "start_time": timezone.localtime(item.start_time),
-            "bio": item.bio
-        })
-        return data
+    def next_change(self, now=None):
+        """
+        Upcoming events change when the next show starts, or when the next show beyond the window
+        comes into it. Shows also read as TODAY or Tomorrow, which changes at midnight.
+        """
+        now = now or timezone.now()
+        changes = [super(EventsWidget, self).next_change(now), schedule.next_midnight(now)]
+        if self.upcoming_events and not self.handpicked:
+            changes.append(event_timeline.next_start(now))
+            if self.upcoming_events_window is not None:
+                window = timedelta(days=int(self.upcoming_events_window))
+                next_in = event_timeline.next_start(now + window, inclusive=True)
+                if next_in is not None:
+                    changes.append(next_in - window)
+        return schedule.earliest(changes, now)
+
+    def item_dependencies(self, items):
+        item_dependencies = super(EventsWidget, self).item_dependencies(items)
+        item_dependencies += [(Widget, item.banner_id) for item in items if item.banner_id]
+        return item_dependencies
+
+    @classmethod
+    def item_fields(cls):
+        fields = super(EventsWidget, cls).item_fields()
+        fields.update([
+            ("image", (['banner__image'], lambda item: item.banner.image.url)),
+            ("ticket_price", (['ticket_price'], lambda item: item.ticket_price)),
+            ("is_free", (['ticket_price'], lambda item: item.is_free)),
+            ("start_time", (['start_time'], lambda item: timezone.localtime(item.start_time))),
+            ("bio", (['bio'], lambda item: item.bio)),
+        ])
+        return fields
 
 
 class PeopleWidget(GroupWidget):
@@ -529,25 +791,32 @@ class PeopleWidget(GroupWidget):
     def item_type(self):
         return "person"
 
+    items_model = Person
+    handpicked_field = 'people'
+    item_version_models = [Person, HouseTeam]
+
     @property
     def items(self):
-        people = Person.objects.all()
-
-        if self.source_house_team:
-            people = Person.objects.filter(house_team=self.source_house_team)
-            return people
-        if self.pk and self.people.exists():
-            people = Person.objects.filter(people_widgets=self)
-
-        return people.distinct()
-
-    def item_data(self, item):
-        data = super(PeopleWidget, self).item_data(item)
-        data.update({
-            "image": item.headshot.url,
-            "bio": item.bio
-        })
-        return data
+        if self.source_house_team_id:
+            return Person.objects.filter(house_teams=self.source_house_team_id)
+        if self.handpicked:
+            return self.handpicked_items()
+        return Person.objects.distinct()
+
+    def item_dependencies(self, items):
+        if self.source_house_team_id:
+            return list(items) + [(HouseTeam, self.source_house_team_id)]
+        return super(PeopleWidget, self).item_dependencies(items)
+
+    @classmethod
+    def item_fields(cls):
+        fields = super(PeopleWidget, cls).item_fields()
+        fields.update([
+            ("name", (['first_name', 'last_name'], lambda item: item.name)),
+            ("image", (['headshot'], lambda item: item.headshot.url)),
+            ("bio", (['bio'], lambda item: item.bio)),
+        ])
+        return fields
 
 
 class ApeClassesWidget(GroupWidget):
@@ -582,32 +851,53 @@ class ApeClassesWidget(GroupWidget):
     def item_type(self):
         return "ape_class"
 
+    items_model = ApeClass
+    handpicked_field = 'ape_classes'
+    item_select_related = ['banner', 'teacher']
+    item_prefetch_related = ['teacher__' + relation for relation in Person.data_prefetch_related]
+    item_version_models = [ApeClass, Widget, Person]
+
     @property
     def items(self):
+        if self.handpicked:
+            return self.handpicked_items()
         ape_classes = ApeClass.objects.filter(registration_open=True)
         if self.class_type:
             ape_classes = ape_classes.filter(class_type=self.class_type)
-        if self.pk and self.ape_classes.exists():
-            handpicked = ApeClass.objects.filter(ape_classes_widgets=self)
-            return handpicked
-        return ape_classes.distinct()
-
-    def item_data(self, item):
-        data = super(ApeClassesWidget, self).item_data(item)
-        data.update({
-            "image": item.banner.image.url,
-            "type": item.class_type,
-            "bio": item.bio,
-            "start_date": timezone.localtime(item.start_date),
-            "class_length": item.class_length,
-            "num_sessions": item.num_sessions,
-            "price": item.price,
-            "is_free": item.is_free
-        })
-        if item.teacher:
-            data.update({
-                "teacher": item.teacher.to_data()
-            })
+        return self.with_item_relations(ape_classes.distinct())
+
+    def next_change(self, now=None):
+        # class start dates read as TODAY or Tomorrow, which changes at midnight
+        now = now or timezone.now()
+        return schedule.earliest([super(ApeClassesWidget, self).next_change(now), schedule.next_midnight(now)], now)
+
+    def item_dependencies(self, items):
+        item_dependencies = super(ApeClassesWidget, self).item_dependencies(items)
+        item_dependencies += [(Widget, item.banner_id) for item in items if item.banner_id]
+        item_dependencies += [(Person, item.teacher_id) for item in items if item.teacher_id]
+        return item_dependencies
+
+    @classmethod
+    def item_fields(cls):
+        fields = super(ApeClassesWidget, cls).item_fields()
+        fields.update([
+            ("image", (['banner__image'], lambda item: item.banner.image.url)),
+            ("type", (['class_type'], lambda item: item.class_type)),
+            ("bio", (['bio'], lambda item: item.bio)),
+            ("start_date", (['start_date'], lambda item: timezone.localtime(item.start_date))),
+            ("class_length", (['class_length'], lambda item: item.class_length)),
+            ("num_sessions", (['num_sessions'], lambda item: item.num_sessions)),
+            ("price", (['price'], lambda item: item.price)),
+            ("is_free", (['price'], lambda item: item.is_free)),
+            ("teacher", (['teacher'], lambda item: item.teacher.to_data() if item.teacher else None)),
+        ])
+        return fields
+
+    def item_data(self, item, fields=None):
+        data = super(ApeClassesWidget, self).item_data(item, fields)
+        if data.get("teacher") is None:
+            # classes without a teacher leave it out altogether
+            data.pop("teacher", None)
         return data
 
 
@@ -617,12 +907,15 @@ class PersonFocusWidget(Widget):
     """
     person = models.ForeignKey(Person)
 
+    data_prefetch_related = ['person'] + ['person__' + relation for relation in Person.data_prefetch_related]
+
     def to_data(self, *args, **kwargs):
         data = super(PersonFocusWidget, self).to_data(*args, **kwargs)
         data.update({
             "type": "person_focus",
             "person": self.person.to_data(*args, **kwargs)
         })
+        dependencies.record(self, [(Person, self.person_id)])
         return data
 
 
@@ -632,18 +925,28 @@ class HouseTeamFocusWidget(Widget):
     """
     house_team = models.ForeignKey(HouseTeam)
 
+    data_prefetch_related = ['house_team'] + ['house_team__' + relation for relation in HouseTeam.data_prefetch_related]
+
     def to_data(self, *args, **kwargs):
         data = super(HouseTeamFocusWidget, self).to_data(*args, **kwargs)
         data.update({
             "type": "house_team_focus",
             "house_team": self.house_team.to_data(*args, **kwargs)
         })
+        house_team_dependencies = [(HouseTeam, self.house_team_id)]
+        if self.house_team.logo_id:
+            house_team_dependencies.append((Widget, self.house_team.logo_id))
+        if self.house_team.image_carousel_id:
+            house_team_dependencies.append((Widget, self.house_team.image_carousel_id))
+        dependencies.record(self, house_team_dependencies)
         return data
 
 
 class BannerWidget(Widget, PageLinkMixin):
     image = models.ImageField(upload_to='images/banner/')
 
+    data_prefetch_related = ['link_type', 'link']
+
     class Meta(Widget.Meta):
         verbose_name = "banner"
         verbose_name_plural = "banners"
@@ -688,6 +991,8 @@ class ImageCarouselWidget(Widget):
         verbose_name = "carousel of big images"
         verbose_name_plural = "carousels of big images"
 
+    data_prefetch_related = ['images__link_type', 'images__link']
+
     def to_data(self, *args, **kwargs):
         data = super(ImageCarouselWidget, self).to_data(*args, **kwargs)
         data.update({
@@ -698,6 +1003,13 @@ class ImageCarouselWidget(Widget):
         })
         return data
 
+    def next_change(self, now=None):
+        now = now or timezone.now()
+        changes = [super(ImageCarouselWidget, self).next_change(now)]
+        for image in self.images.all():
+            changes += [image.start_date, image.end_date]
+        return schedule.earliest(changes, now)
+
 
 class ImageCarouselItem(PageLinkWidgetItem):
     carousel = models.ForeignKey(ImageCarouselWidget, related_name='images')
@@ -788,6 +1100,7 @@ class Video(models.Model):
 
     def to_data(self, *args, **kwargs):
         data = {
+            "id": self.id,
             "name": self.name,
             "description": self.description,
             "source": self.video_file.url,
@@ -817,12 +1130,15 @@ class Video(models.Model):
 class VideoFocusWidget(Widget):
     video = models.ForeignKey(Video)
 
+    data_prefetch_related = ['video']
+
     def to_data(self, *args, **kwargs):
         data = super(VideoFocusWidget, self).to_data(*args, **kwargs)
         data.update({
             "type": "video_focus",
             "video": self.video.to_data(*args, **kwargs)
         })
+        dependencies.record(self, [(Video, self.video_id)])
         return data
 
 
@@ -846,20 +1162,24 @@ class VideosWidget(GroupWidget):
     def item_type(self):
         return "video"
 
+    items_model = Video
+    handpicked_field = 'videos'
+    item_version_models = [Video]
+
     @property
     def items(self):
-        videos = Video.objects.all()
-        if self.pk and self.videos.exists():
-            videos = Video.objects.filter(video_widgets=self)
-        return videos.distinct()
-
-    def item_data(self, item):
-        data = super(VideosWidget, self).item_data(item)
-        data.update({
-            "source": item.video_file.url,
-            "description": item.description
-        })
-        return data
+        if self.handpicked:
+            return self.handpicked_items()
+        return Video.objects.distinct()
+
+    @classmethod
+    def item_fields(cls):
+        fields = super(VideosWidget, cls).item_fields()
+        fields.update([
+            ("source", (['video_file'], lambda item: item.video_file.url)),
+            ("description", (['description'], lambda item: item.description)),
+        ])
+        return fields
 
 
 class VideoWidget(Widget):
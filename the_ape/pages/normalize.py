@@ -0,0 +1,102 @@
+"""
+The normalized API format (?format=normalized): rather than inlining an event, person, class, house team
+or video everywhere it shows up (a teacher inside each of their classes, every performer inside their
+house team, ...), each one is given once, in a top level map keyed by id, and referred to by its id:
+
+    {
+        "name": "Classes",
+        "widgets": [{"type": "gallery", "item_type": "ape_class", "items": [3, 4], ...}],
+        "classes": {"3": {"id": 3, "teacher": 7, ...}, "4": {"id": 4, "teacher": 7, ...}},
+        "people": {"7": {"id": 7, "name": "Funnyboy Jones", ...}},
+        "events": {}, "house_teams": {}, "videos": {}
+    }
+
+Anything given in more than one shape (a person as a group widget item and as a teacher, say) has all
+its fields merged into the one entry.
+"""
+from collections import OrderedDict
+
+FORMATS = ('nested', 'normalized')
+
+# the top level maps, and which of them a group widget's items go in
+ENTITY_TYPES = ('events', 'people', 'classes', 'house_teams', 'videos')
+ITEM_TYPES = {
+    'event': 'events',
+    'person': 'people',
+    'ape_class': 'classes',
+    'video': 'videos',
+}
+# keys which hold an entity (or a list of them) inside widgets & entities, and the map each goes in
+REFERENCES = {
+    'person': 'people',
+    'house_team': 'house_teams',
+    'video': 'videos',
+    'teacher': 'people',
+    'performers': 'people',
+    'house_teams': 'house_teams',
+}
+
+
+def response_format(request):
+    """
+    The format asked for with ?format=, raising ValueError if it's not one we know.
+    """
+    response_format = request.GET.get('format', 'nested')
+    if response_format not in FORMATS:
+        raise ValueError("format has to be one of {}".format(', '.join(FORMATS)))
+    return response_format
+
+
+class Normalizer(object):
+
+    def __init__(self):
+        self.entities = OrderedDict((entity_type, OrderedDict()) for entity_type in ENTITY_TYPES)
+
+    def add(self, entity_type, data):
+        """
+        Adds an entity to its map, returning its id to refer to it by.
+        """
+        if not isinstance(data, dict) or data.get('id') is None:
+            return data
+        data = self.references(data)
+        entities = self.entities[entity_type]
+        key = str(data['id'])
+        if key in entities:
+            entities[key].update(data)
+        else:
+            entities[key] = data
+        return data['id']
+
+    def references(self, data):
+        """
+        A copy of data with the entities in it replaced by their ids.
+        """
+        data = dict(data)
+        for key, entity_type in REFERENCES.items():
+            if key not in data:
+                continue
+            if isinstance(data[key], list):
+                data[key] = [self.add(entity_type, entity) for entity in data[key]]
+            else:
+                data[key] = self.add(entity_type, data[key])
+        return data
+
+    def widget(self, data):
+        data = self.references(data)
+        entity_type = ITEM_TYPES.get(data.get('item_type'))
+        if entity_type and 'items' in data:
+            data['items'] = [self.add(entity_type, item) for item in data['items']]
+        return data
+
+
+def normalize(data):
+    """
+    data for a page (anything with a list of widgets) or a single widget, in the normalized format.
+    """
+    normalizer = Normalizer()
+    if 'widgets' in data:
+        data = dict(data, widgets=[normalizer.widget(widget) for widget in data['widgets']])
+    else:
+        data = normalizer.widget(data)
+    data.update(normalizer.entities)
+    return data
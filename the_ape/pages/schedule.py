@@ -0,0 +1,36 @@
+"""
+Works out when a page's rendered output will next change on its own, without anyone editing anything:
+a widget or carousel image turning on or off at its start_date/end_date, a show starting (and dropping
+out of the upcoming events), a show coming into an upcoming events window, or the day rolling over
+(event times are shown as TODAY/Tomorrow). Caches for the page and its widgets expire at that moment,
+so they can be kept for hours and still flip on time.
+"""
+import math
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def earliest(moments, now):
+    """
+    The earliest of the given moments that's still in the future, or None
+    """
+    upcoming = [m for m in moments if m is not None and m > now]
+    return min(upcoming) if upcoming else None
+
+
+def next_midnight(now):
+    tomorrow = timezone.localtime(now).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(tomorrow, time.min))
+
+
+def cache_timeout(timeout, next_change, now=None):
+    """
+    Shortens timeout (in seconds) so that whatever it's for expires no later than next_change.
+    """
+    if not timeout or next_change is None:
+        return timeout
+    now = now or timezone.now()
+    seconds_left = max(int(math.ceil((next_change - now).total_seconds())), 1)
+    return min(timeout, seconds_left)
+
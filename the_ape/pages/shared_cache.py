@@ -0,0 +1,63 @@
+"""
+Helpers for data that's kept in the shared cache, or kept in step between processes through it.
+
+Data each process keeps a copy of for itself (the page slug index, the event timeline) has a version in
+the shared cache. Changing the data gives it a new version (see new_version), and every process loads
+its copy again the next time it's used (see LocalCopy).
+"""
+import time
+from threading import Lock
+
+from django.core.cache import cache
+from django.db import transaction
+
+# cached in place of a row that doesn't exist, so lookups for missing ids don't query over and over
+MISSING = False
+
+
+def current_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def new_version(key):
+    """
+    Gives the data versioned under key a new version, both straight away and once the current transaction
+    commits (a process loading the data in between would still see the old rows).
+    """
+    cache.set(key, time.time(), timeout=None)
+    transaction.on_commit(lambda: cache.set(key, time.time(), timeout=None))
+
+
+class LocalCopy(object):
+    """
+    A per-process copy of what load(version) returns, loaded again whenever the version under version_key
+    changes, and, if max_age is given, once the copy is older than max_age() seconds.
+    """
+
+    def __init__(self, version_key, load, max_age=None):
+        self.version_key = version_key
+        self.load = load
+        self.max_age = max_age
+        self._copy = None
+        self._lock = Lock()
+
+    def is_stale(self, copy, version):
+        if copy is None or copy[0] != version:
+            return True
+        return self.max_age is not None and copy[1] < time.time() - self.max_age()
+
+    def get(self):
+        version = current_version(self.version_key)
+        copy = self._copy
+        if self.is_stale(copy, version):
+            with self._lock:
+                copy = (version, time.time(), self.load(version))
+                self._copy = copy
+        return copy[2]
+
+    def invalidate(self):
+        new_version(self.version_key)
@@ -0,0 +1,154 @@
+"""
+Keeps cached widget & page html, and published page snapshots, in step with the rows widgets are built
+from (see pages.dependencies and pages.snapshots), along with the indexes kept of pages, slugs & events.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from classes.models import ApeClass
+from events.models import Event
+from pages import availability, dependencies, event_timeline, slug_index, slug_redirects, snapshots
+from pages.models import Page, PageToWidget, Widget, BannerWidget, ImageCarouselItem, Video, EventsWidget, PeopleWidget, \
+    ApeClassesWidget, VideosWidget
+from people.models import Person, HouseTeam, HouseTeamMembership
+
+
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=ApeClass)
+def item_changed(sender, instance, **kwargs):
+    dependencies.invalidate(sender, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed(sender, instance, **kwargs):
+    event_timeline.invalidate()
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=ApeClass)
+def seats_changed(sender, instance, **kwargs):
+    availability.update_counts(instance)
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=ApeClass)
+def seats_removed(sender, instance, **kwargs):
+    availability.remove_counts(instance)
+
+
+def shown_with(person):
+    """
+    The house teams and classes that include the person's data, as (model, pk) pairs.
+    """
+    return [(HouseTeam, pk) for pk in person.house_team_performers.values_list('house_team_id', flat=True)] + \
+        [(ApeClass, pk) for pk in ApeClass.objects.filter(teacher=person).values_list('pk', flat=True)]
+
+
+@receiver(pre_delete, sender=Person)
+def person_deleting(sender, instance, **kwargs):
+    # by post_delete their memberships (and classes) are gone, along with any trace of what they were in
+    instance._shown_with = shown_with(instance)
+
+
+@receiver([post_save, post_delete], sender=Person)
+def person_changed(sender, instance, **kwargs):
+    dependencies.invalidate(Person, instance.pk)
+    related = instance.__dict__.pop('_shown_with', None)
+    for model, pk in shown_with(instance) if related is None else related:
+        if pk is not None:
+            dependencies.invalidate(model, pk)
+
+
+@receiver([post_save, post_delete], sender=HouseTeam)
+def house_team_changed(sender, instance, **kwargs):
+    dependencies.invalidate(HouseTeam, instance.pk)
+    # people include the names of their house teams
+    for person_id in instance.house_team_performers.values_list('person_id', flat=True):
+        dependencies.invalidate(Person, person_id)
+
+
+@receiver([post_save, post_delete], sender=HouseTeamMembership)
+def membership_changed(sender, instance, **kwargs):
+    dependencies.invalidate(Person, instance.person_id)
+    if instance.house_team_id:
+        dependencies.invalidate(HouseTeam, instance.house_team_id)
+
+
+@receiver([post_save, post_delete], sender=Video)
+def video_changed(sender, instance, **kwargs):
+    dependencies.invalidate(Video, instance.pk)
+    for person_id in instance.person_set.values_list('id', flat=True):
+        dependencies.invalidate(Person, person_id)
+    for house_team_id in instance.houseteam_set.values_list('id', flat=True):
+        dependencies.invalidate(HouseTeam, house_team_id)
+
+
+@receiver([post_save, post_delete])
+def widget_changed(sender, instance, **kwargs):
+    # banners, logos and carousels show up inside events, classes and house teams
+    if issubclass(sender, Widget):
+        dependencies.invalidate(Widget, instance.pk)
+        snapshots.expire_widgets([instance.pk])
+    if issubclass(sender, BannerWidget):
+        event_timeline.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Page)
+def page_changed(sender, instance, **kwargs):
+    snapshots.expire([instance.pk])
+    slug_index.invalidate()
+
+
+@receiver(post_save, sender=ApeClass)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=HouseTeam)
+@receiver(post_save, sender=Page)
+def slugged_item_saved(sender, instance, **kwargs):
+    slug_redirects.update(instance)
+
+
+@receiver(post_delete, sender=ApeClass)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=HouseTeam)
+@receiver(post_delete, sender=Page)
+def slugged_item_deleted(sender, instance, **kwargs):
+    slug_redirects.remove(instance)
+
+
+@receiver([post_save, post_delete], sender=PageToWidget)
+def page_widgets_changed(sender, instance, **kwargs):
+    snapshots.expire([instance.page_id])
+
+
+@receiver(dependencies.widgets_invalidated)
+def widgets_invalidated(sender, widget_ids, **kwargs):
+    snapshots.expire_widgets(widget_ids)
+
+
+@receiver([post_save, post_delete], sender=ImageCarouselItem)
+def carousel_item_changed(sender, instance, **kwargs):
+    dependencies.invalidate_widgets([instance.carousel_id])
+    dependencies.invalidate(Widget, instance.carousel_id)
+
+
+@receiver(m2m_changed, sender=Person.videos.through)
+@receiver(m2m_changed, sender=HouseTeam.videos.through)
+def videos_changed(sender, instance, action, model, pk_set, **kwargs):
+    if action.startswith('post_'):
+        dependencies.invalidate(type(instance), instance.pk)
+        for pk in pk_set or []:
+            dependencies.invalidate(model, pk)
+
+
+@receiver(m2m_changed, sender=EventsWidget.events.through)
+@receiver(m2m_changed, sender=PeopleWidget.people.through)
+@receiver(m2m_changed, sender=ApeClassesWidget.ape_classes.through)
+@receiver(m2m_changed, sender=VideosWidget.videos.through)
+def handpicked_items_changed(sender, instance, action, pk_set, **kwargs):
+    if action.startswith('post_'):
+        if isinstance(instance, Widget):
+            dependencies.invalidate_widgets([instance.pk])
+        else:
+            dependencies.invalidate_widgets(pk_set or [])
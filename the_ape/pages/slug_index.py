@@ -0,0 +1,61 @@
+"""
+An in-memory index of page slugs, so urls that can't be a page (bots probing /wp-login.php,
+/xmlrpc.php, ...) are turned away before any database work, with a 404 that's only rendered once.
+
+Each process keeps its own copy of the index (see pages.shared_cache.LocalCopy). Saving or deleting a
+page gives the index a new version in the cache (see pages.signals), and every process reloads its
+copy the next time it's asked about a slug. That needs a cache shared by every process
+(see the production settings), but in case a process misses a new version anyway, copies are reloaded
+after a while regardless:
+
+    SLUG_INDEX_MAX_AGE      seconds a process keeps its copy of the index for at most
+"""
+from django.conf import settings
+from django.http import HttpResponseNotFound
+from django.template.loader import render_to_string
+
+from pages import shared_cache
+from pages.models import Page
+
+VERSION_KEY = 'page_slug_index_version'
+
+_not_found = None
+
+
+def max_age():
+    return getattr(settings, 'SLUG_INDEX_MAX_AGE', 60)
+
+
+def load(version):
+    return frozenset(filter(None, Page.objects.values_list('slug', flat=True)))
+
+
+_index = shared_cache.LocalCopy(VERSION_KEY, load, max_age=max_age)
+
+
+def slugs():
+    """
+    The slugs of every page.
+    """
+    return _index.get()
+
+
+def exists(slug):
+    return slug in slugs()
+
+
+def invalidate():
+    """
+    Has every process reload its index.
+    """
+    _index.invalidate()
+
+
+def not_found():
+    """
+    A 404 for a page that doesn't exist. 404.html doesn't depend on the request, so it's rendered once.
+    """
+    global _not_found
+    if _not_found is None:
+        _not_found = render_to_string('404.html')
+    return HttpResponseNotFound(_not_found)
@@ -0,0 +1,102 @@
+"""
+The canonical slug of every class, event, person, house team and page, by the type in its url and its
+id, so working out whether a url needs a 301 to its slugged version (see get_slug_redirect) doesn't
+need a query.
+
+The map lives in the shared cache. It's built in full the first time it's needed (and again if the
+cache is cleared), and kept up to date as rows are saved and deleted (see pages.signals), once the
+change is committed. Anything the cache has dropped in between is looked up on its own and put back.
+Entries are only kept for a while, so the map can't drift from the database for longer than that:
+
+    SLUG_REDIRECTS_TIMEOUT      seconds to keep the map, and each slug in it, for
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.defaultfilters import slugify
+
+from classes.models import ApeClass
+from events.models import Event
+from pages.models import Page
+from pages.shared_cache import MISSING
+from people.models import Person, HouseTeam
+
+BUILT_KEY = 'slug_redirects_built'
+SLUG_KEY = 'canonical_slug:{url_type}:{pk}'
+
+URL_TYPES = OrderedDict([
+    ('classes', ApeClass),
+    ('events', Event),
+    ('people', Person),
+    ('house_teams', HouseTeam),
+    ('page', Page),
+])
+# the fields each model's slug is made from
+SLUG_FIELDS = {
+    ApeClass: ['name'],
+    Event: ['name'],
+    Person: ['first_name', 'last_name'],
+    HouseTeam: ['name'],
+    Page: ['name'],
+}
+
+
+def url_type(model):
+    for name, url_model in URL_TYPES.items():
+        if model is url_model:
+            return name
+    return None
+
+
+def slug_for(instance):
+    if isinstance(instance, Page):
+        # pages have a slug of their own for their top level url, their /page/<id>/ urls use their name
+        return slugify(instance.name)
+    return instance.slug
+
+
+def timeout():
+    return getattr(settings, 'SLUG_REDIRECTS_TIMEOUT', 60 * 60)
+
+
+def build():
+    slugs = {}
+    for name, model in URL_TYPES.items():
+        for instance in model._base_manager.only(*SLUG_FIELDS[model]):
+            slugs[SLUG_KEY.format(url_type=name, pk=instance.pk)] = slug_for(instance)
+    cache.set_many(slugs, timeout())
+    cache.set(BUILT_KEY, True, timeout())
+
+
+def canonical_slug(url_type, pk):
+    """
+    The slug the url for the given (url type, id) should end in, or None if there's no such row.
+    """
+    model = URL_TYPES.get(url_type)
+    if model is None or not str(pk).isdigit():
+        return None
+    if not cache.get(BUILT_KEY):
+        build()
+    key = SLUG_KEY.format(url_type=url_type, pk=pk)
+    slug = cache.get(key)
+    if slug is None:
+        instance = model._base_manager.only(*SLUG_FIELDS[model]).filter(pk=pk).first()
+        slug = slug_for(instance) if instance is not None else MISSING
+        cache.set(key, slug, timeout())
+    return slug if slug is not MISSING else None
+
+
+def set_on_commit(instance, slug):
+    # saves and deletes that get rolled back mustn't change the map
+    key = SLUG_KEY.format(url_type=url_type(type(instance)), pk=instance.pk)
+    transaction.on_commit(lambda: cache.set(key, slug, timeout()))
+
+
+def update(instance):
+    set_on_commit(instance, slug_for(instance))
+
+
+def remove(instance):
+    set_on_commit(instance, MISSING)
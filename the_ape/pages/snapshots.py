@@ -0,0 +1,102 @@
+"""
+Publishes pages as precomputed snapshots of their data, so the hottest read path is a single lookup
+rather than a page's worth of queries and serialization.
+
+A page's snapshot is thrown away whenever the page, one of its widgets, or anything those widgets are
+built from (see pages.dependencies) changes, and is published again as soon as the change is committed.
+Snapshots also expire when the page next changes by itself (see pages.schedule), so upcoming shows
+come and go on time. A page without a current snapshot is published the next time it's asked for.
+
+A request publishing a page can read it before a change commits and write after the change has been
+published, so a snapshot is only ever replaced by one read later than it was.
+"""
+import hashlib
+import pickle
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from pages import dependencies, encoders, schedule
+from pages.cache import page_cache_timeout
+from pages.models import Page, PageSnapshot, PageToWidget, to_cache_key
+
+
+def publish(page, now=None):
+    """
+    Publishes a snapshot of page as it is now, returning it, or the snapshot published in the meantime
+    from what the page was like later on.
+    """
+    now = now or timezone.now()
+    data = page.to_data()
+    next_changes = {w.pk: w.next_change(now) for w in page.all_widgets()}
+    next_change = schedule.earliest(next_changes.values(), now)
+    widgets = page.active_widgets()
+    dependencies.load_versions(widgets)
+    cache_key = to_cache_key([page.cache_key()] + [w.cache_key for w in widgets])
+    cache_info = {
+        'cache_key': cache_key,
+        'cache_timeout': page_cache_timeout(page),
+        'next_change': next_change,
+        'widgets': [{'cache_key': w.cache_key, 'next_change': next_changes[w.pk]} for w in widgets],
+    }
+
+    fields = {
+        'slug': page.slug,
+        'data': encoders.encode(data).decode('utf-8'),
+        'native': pickle.dumps({'data': data, 'cache_info': cache_info}, pickle.HIGHEST_PROTOCOL),
+        'etag': hashlib.md5(to_cache_key([cache_key, next_change]).encode('utf-8')).hexdigest(),
+        'generated': now,
+        'expires': next_change,
+    }
+    snapshots = PageSnapshot.objects.filter(page=page)
+    for attempt in range(2):
+        if snapshots.filter(generated__lte=now).update(**fields):
+            break
+        try:
+            with transaction.atomic():
+                return PageSnapshot.objects.create(page=page, **fields)
+        except IntegrityError:
+            # published in the meantime, try replacing that one instead
+            continue
+    return snapshots.get()
+
+
+def get(page_id=None, page_slug=None, now=None):
+    """
+    Returns the current snapshot of a page, or None if it has to be published first.
+    """
+    snapshots = PageSnapshot.objects.filter(page_id=page_id) if page_id else PageSnapshot.objects.filter(slug=page_slug)
+    snapshots = list(snapshots[:2])
+    if len(snapshots) != 1 or snapshots[0].is_expired(now):
+        return None
+    return snapshots[0]
+
+
+def native_data(snapshot):
+    """
+    The (data, cache_info) stored in snapshot, with their datetimes, Decimals, etc intact.
+    """
+    native = pickle.loads(bytes(snapshot.native))
+    return native['data'], native['cache_info']
+
+
+def expire(page_ids):
+    """
+    Throws away the snapshots of the given pages, publishing them again once the current transaction commits.
+    """
+    page_ids = set(page_ids)
+    if not page_ids:
+        return
+    PageSnapshot.objects.filter(page_id__in=page_ids).delete()
+    transaction.on_commit(lambda: republish(page_ids))
+
+
+def expire_widgets(widget_ids):
+    widget_ids = set(widget_ids)
+    if widget_ids:
+        expire(PageToWidget.objects.filter(widget_id__in=widget_ids).values_list('page_id', flat=True))
+
+
+def republish(page_ids):
+    for page in Page.objects.filter(id__in=page_ids):
+        publish(page)
@@ -3,18 +3,17 @@ import re
 from datetime import datetime, timedelta
 from urllib.parse import urlsplit, SplitResult
 
-from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from django.template import Node, Variable, Library
+from django.template import Node, Variable, Library, TemplateSyntaxError
 from django.core.urlresolvers import reverse
-from django.template.defaultfilters import slugify
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.text import capfirst
 
-from accounts.models import UserProfile, EventAttendee, Ticket, ClassMember
+from accounts import entitlements
 from classes.models import ApeClass
 from events.models import Event
+from pages import availability, cache as fragment_cache, slug_redirects
 from pages.models import Page
 from people.models import Person, HouseTeam
 
@@ -104,9 +103,65 @@ def json_safe(string):
     return mark_safe(string.replace(r"\n", "\n").replace(r"\r", "\r"))
 
 
+class FragmentCacheNode(Node):
+    def __init__(self, nodelist, timeout, name, key, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.key = key
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        key = self.key.resolve(context)
+        if not timeout or not key:
+            return self.nodelist.render(context)
+
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return fragment_cache.get_or_render(
+            self.name.resolve(context),
+            fragment_cache.fragment_key(key, vary_on),
+            timeout,
+            lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag('fragmentcache')
+def do_fragment_cache(parser, token):
+    """
+    Caches the contents of a template fragment, e.g.
+
+        {% fragmentcache widget.cache_timeout widget.type widget.cache_key request.user|fragment_user:widget.per_user %}
+            ...
+        {% endfragmentcache %}
+
+    Unlike django's {% cache %} tag, the fragment's key is a variable, and hits & misses are counted
+    under the given name (see pages.cache). Nothing is cached if the timeout or the key is empty.
+    """
+    nodelist = parser.parse(('endfragmentcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4:
+        raise TemplateSyntaxError("'%r' tag requires at least 3 arguments." % tokens[0])
+    timeout, name, key = [parser.compile_filter(t) for t in tokens[1:4]]
+    vary_on = [parser.compile_filter(t) for t in tokens[4:]]
+    return FragmentCacheNode(nodelist, timeout, name, key, vary_on)
+
+
+@register.filter
+def fragment_user(user, per_user):
+    """
+    What a fragment varies on for the logged in visitor, e.g. {% fragmentcache ... request.user|fragment_user:widget.per_user %}
+    """
+    return fragment_cache.user_vary_on(user, per_user)
+
+
+re_slug_needing = re.compile(r'^/(?P<type>classes|events|people|house_teams|page)/(?P<id>\w+)(?:/(?P<page_slug>[\w|\-]+))?')
+
+
 # if no redirect is needed, return False; otherwise, return correct path with slug
 def get_slug_redirect(path):
-    slug_needing_pattern = re.match('^/(?P<type>classes|events|people|house_teams|page)/(?P<id>\w+)', path)
+    slug_needing_pattern = re_slug_needing.match(path)
 
     # don't bother adding slug to see_all, or if the url is not displaying books, series, or contributors
     if not slug_needing_pattern:
@@ -114,76 +169,57 @@ def get_slug_redirect(path):
 
     item_type = slug_needing_pattern.group('type')
     item_id = slug_needing_pattern.group('id')
+    # looked up in the map of canonical slugs rather than the database (see pages.slug_redirects)
+    slug = slug_redirects.canonical_slug(item_type, item_id)
+    if slug is None:
+        # no such item, the view will 404
+        return False
 
-    if item_type == 'classes':
-        item = ApeClass.objects.get(id=item_id)
-    elif item_type == 'events':
-        item = Event.objects.get(id=item_id)
-    elif item_type == 'people':
-        item = Person.objects.get(id=item_id)
-    elif item_type == 'page':
-        item = Page.objects.get(id=item_id)
-    else:
-        item = HouseTeam.objects.get(id=item_id)
-
-    if item_type == 'page':
-        slug = slugify(item.name)
-    else:
-        slug = item.slug
-
-    end_slug = re.match('^/(classes|events|people|house_teams|page)/\w+/(?P<page_slug>[\w|\-]+)', path)
-    if end_slug and end_slug.group('page_slug') == slug:
+    if slug_needing_pattern.group('page_slug') == slug:
         # if current slug is correct there is no need to redirect
         return False
 
     return '/{}/{}/{}'.format(item_type, item_id, slug)
 
 
+# the filters below read from what the user has signed up for, loaded once a request (see accounts.entitlements)
 @register.filter
 def is_registered(user_id, ape_class_id):
-    profile = User.objects.get(id=user_id).profile
-    ape_class = ApeClass.objects.get(id=ape_class_id)
-    if ClassMember.objects.filter(student=profile, ape_class=ape_class).exists():
-        return True
-    return False
+    return entitlements.for_user(user_id).is_registered(ape_class_id)
 
 
 @register.filter
 def ticket_link(event_id, profile_id):
-    event = Event.objects.get(id=event_id)
-    profile = UserProfile.objects.get(id=profile_id)
-    try:
-        ticket = EventAttendee.objects.filter(event=event, attendee=profile).first().ticket
-    except AttributeError:
-        return ''
-    return ticket.get_absolute_url()
+    return entitlements.for_profile(profile_id).ticket_url(event_id)
 
 
 @register.filter
 def class_registration_link(ape_class_id, profile_id):
-    ape_class = ApeClass.objects.get(id=ape_class_id)
-    profile = UserProfile.objects.get(id=profile_id)
-    try:
-        registration = ClassMember.objects.filter(ape_class=ape_class, student=profile).first().registration
-    except AttributeError:
-        return ''
-    return registration.get_absolute_url()
+    return entitlements.for_profile(profile_id).registration_url(ape_class_id)
+
+
+@register.simple_tag
+def load_availability(items, item_type):
+    """
+    Works out whether a widget's events or classes are sold out all at once, for is_sold_out and is_full.
+    Their seats aren't part of the widget's data, since they change far more often than anything else in it.
+    """
+    model = {'event': Event, 'ape_class': ApeClass}.get(item_type)
+    if model is not None:
+        availability.load(model, [item['id'] for item in items])
+    return ''
 
 
 @register.filter
 def is_sold_out(event_id):
-    event = Event.objects.get(id=event_id)
-    if event.tickets_sold >= event.max_tickets:
-        return True
-    return False
+    event = availability.get(Event, event_id)
+    return event is not None and event.sold_out
 
 
 @register.filter
 def is_full(class_id):
-    ape_class = ApeClass.objects.get(id=class_id)
-    if ape_class.students_registered >= ape_class.max_enrollment:
-        return True
-    return False
+    ape_class = availability.get(ApeClass, class_id)
+    return ape_class is not None and ape_class.sold_out
 
 
 @register.filter
@@ -1,21 +1,42 @@
 from __future__ import unicode_literals
 
+import gzip
+import io
 import json
+import os
+import re
+import shutil
+import tempfile
+import time
 from bs4 import BeautifulSoup
-from datetime import timedelta, datetime
-from io import BytesIO
+from datetime import date, timedelta, datetime
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+from io import BytesIO, StringIO
 from PIL import Image
 
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import reverse
-from django.test import TestCase, override_settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from classes.models import ApeClass
 from events.models import Event
-from pages.models import Page, BannerWidget, TextWidget, ImageCarouselWidget, \
-    PersonFocusWidget, EventsWidget
-from pages.templatetags.page_tags import wrapped_url
+from pages import availability, cache as fragment_cache, compression, dependencies, encoders, inventory, minify, \
+    schedule, signals, slug_index, snapshots, widget_templates
+from pages.models import Page, PageSnapshot, Widget, BannerWidget, TextWidget, ImageCarouselWidget, ImageCarouselItem, \
+    PersonFocusWidget, HouseTeamFocusWidget, EventsWidget, PeopleWidget, ApeClassesWidget, Video, VideoFocusWidget
+from pages.views import JSONHttpResponse
+from pages.templatetags.page_tags import get_slug_redirect, is_full, is_sold_out, load_availability, wrapped_url
 from people.models import HouseTeam, Person, HouseTeamMembership
 
 
@@ -379,6 +400,28 @@ class WebPageWrapperTest(TestCase):
         response = self.client.get(page_url)
         self.assertEqual(response.status_code, 200)
 
+    def test_page_rendered_from_native_data(self):
+        """
+        HTML pages are rendered straight from the page's data, without a round trip through JSON,
+        while the API keeps serving the same JSON it always has.
+        """
+        page = Page.objects.create(name='Shows', slug='shows')
+        self.event1.start_time = timezone.now() + timedelta(days=1)
+        self.event1.banner = BannerWidget.objects.create(name="Banner Widget",
+                                                         image=make_image_file(size=(2048, 1), color="#ff0000"))
+        self.event1.save()
+        widget = EventsWidget.objects.create(name="Upcoming Shows", upcoming_events=True)
+        page.add_widget(widget)
+
+        response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'shows'}))
+        self.assertEqual(response.status_code, 200)
+        event_data = response.context['page']['widgets'][0]['items'][0]
+        self.assertIsInstance(event_data['start_time'], datetime)
+        self.assertIsInstance(event_data['ticket_price'], Decimal)
+
+        response = self.client.get(page.get_api_url())
+        self.assertEqual(response.content.decode(), json.dumps(page.to_data(), cls=DjangoJSONEncoder))
+
     def test_get_404_as_guest(self):
         self.client.logout()
         url = "page/thisisinnowayshapeorformavalidurl"
@@ -398,3 +441,1128 @@ class WebPageWrapperTest(TestCase):
         response = self.client.get(web_url)
         self.assertEqual(response.status_code, 200)
 
+
+
+class PageTestCase(TestCase):
+    """
+    Starts each test with nothing cached and an empty page (page_name, page_slug) to add widgets to.
+    make_event() makes events with everything they need to be serialized.
+    """
+    page_name = "Shows"
+    page_slug = "shows"
+
+    def setUp(self):
+        cache.clear()
+        availability.forget()
+        self.page = Page.objects.create(name=self.page_name, slug=self.page_slug)
+
+    @property
+    def banner(self):
+        # events and classes are serialized with their banner
+        if not hasattr(self, '_banner'):
+            self._banner = BannerWidget.objects.create(name="banner", image=make_image_file(size=(2048, 1)))
+        return self._banner
+
+    def make_event(self, name="Show", **fields):
+        fields.setdefault('bio', "A show")
+        fields.setdefault('ticket_price', 5)
+        fields.setdefault('start_time', timezone.now() + timedelta(days=3))
+        return Event.objects.create(name=name, banner=self.banner, **fields)
+
+
+class FragmentCacheTest(PageTestCase):
+    """
+    Tests caching of the rendered html for pages and their widgets.
+    """
+    page_name = "Cached"
+    page_slug = "hype"
+
+    def setUp(self):
+        super(FragmentCacheTest, self).setUp()
+        self.widget = TextWidget.objects.create(name="Text Widget", content="original text")
+        self.page.add_widget(self.widget)
+        self.page_url = reverse('slug_page_wrapper', kwargs={'page_slug': 'hype'})
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60, WIDGET_CACHE_TIMEOUT=60)
+    def test_page_fragment_cached(self):
+        response = self.client.get(self.page_url)
+        self.assertContains(response, "original text")
+        self.assertEqual(fragment_cache.get_stats()['page'], {'hits': 0, 'misses': 1})
+
+        response = self.client.get(self.page_url)
+        self.assertContains(response, "original text")
+        self.assertEqual(fragment_cache.get_stats()['page'], {'hits': 1, 'misses': 1})
+
+        # editing a widget gets the page a fresh fragment
+        self.widget.content = "new text"
+        self.widget.save()
+        response = self.client.get(self.page_url)
+        self.assertContains(response, "new text")
+        self.assertEqual(fragment_cache.get_stats()['page'], {'hits': 1, 'misses': 2})
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60, WIDGET_CACHE_TIMEOUT=60, WIDGET_CACHE_TIMEOUTS={'text': 0})
+    def test_cache_timeouts(self):
+        self.page.cache_timeout = 0
+        self.page.save()
+        self.client.get(self.page_url)
+        self.client.get(self.page_url)
+        self.assertEqual(fragment_cache.get_stats(), {})
+
+        self.page.add_widget(BannerWidget.objects.create(
+            name="Banner Widget", image=make_image_file(size=(2048, 1), color="#ff0000")
+        ))
+        self.client.get(self.page_url)
+        self.client.get(self.page_url)
+        self.assertEqual(fragment_cache.get_stats(), {'banner': {'hits': 1, 'misses': 1}})
+
+    def test_stats_names(self):
+        # each name's counts have keys of their own, there's no list of names for workers to overwrite
+        for name in ('text', 'text', 'banner'):
+            fragment_cache.get_or_render(name, name + '-fragment', 60, lambda: name)
+        self.assertIsNone(cache.get('fragment_cache_stats'))
+        self.assertEqual(fragment_cache.get_stats(), {
+            'text': {'hits': 1, 'misses': 1},
+            'banner': {'hits': 0, 'misses': 1},
+        })
+        fragment_cache.reset_stats()
+        self.assertEqual(fragment_cache.get_stats(), {})
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60, WIDGET_CACHE_TIMEOUT=60)
+    def test_per_user(self):
+        for username in ('first', 'second'):
+            User.objects.create_user(username, '{}@example.com'.format(username), 'password')
+
+        def visit(username):
+            self.client.login(username=username, password='password')
+            self.client.get(self.page_url)
+
+        # every logged in visitor gets the same fragments
+        visit('first')
+        visit('second')
+        self.assertEqual(fragment_cache.get_stats()['page'], {'hits': 1, 'misses': 1})
+
+        # unless they show something about the visitor
+        with patch.object(fragment_cache, 'PER_USER_WIDGET_TYPES', frozenset(['text'])):
+            visit('first')
+            visit('second')
+            visit('first')
+        self.assertEqual(fragment_cache.get_stats()['page'], {'hits': 2, 'misses': 3})
+        self.assertEqual(fragment_cache.get_stats()['text'], {'hits': 0, 'misses': 3})
+
+
+class ConditionalGetTest(PageTestCase):
+    """
+    Tests answering requests for resources the client already has with a 304.
+    """
+
+    def setUp(self):
+        super(ConditionalGetTest, self).setUp()
+        self.widget = TextWidget.objects.create(name="Text Widget", content="original text")
+        self.page.add_widget(self.widget)
+        self.event = self.make_event()
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_page_api(self):
+        url = '/api/shows.json'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.widget.content = "new text"
+        self.widget.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_wrapped_page(self):
+        url = reverse('slug_page_wrapper', kwargs={'page_slug': 'shows'})
+        self.client.get(url)  # picks up a CSRF cookie, which the ETag varies on
+        response = self.client.get(url)
+        self.assertContains(response, "original text")
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+
+        # the api and html versions of a page aren't interchangeable
+        self.assertNotEqual(self.client.get('/api/shows.json')['ETag'], etag)
+
+        self.widget.content = "new text"
+        self.widget.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), "new text")
+
+    def test_event_api(self):
+        url = '/api/events/{}.json'.format(self.event.id)
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.event.tickets_sold += 1
+        self.event.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode())['tickets_left'], self.event.max_tickets - 1)
+
+
+class LazyWidgetTest(TestCase):
+    """
+    Tests loading widgets on their own, for pages that only send their first few widgets.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.page = Page.objects.create(name='Talent', slug='hype', server_rendered_widgets=1)
+        self.first = TextWidget.objects.create(name="First", content="first text")
+        self.second = TextWidget.objects.create(name="Second", content="second text")
+        self.page.add_widget(self.first)
+        self.page.add_widget(self.second)
+
+    def test_widget_api(self):
+        url = reverse('widget', kwargs={'widget_id': self.second.id})
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content.decode()), self.second.to_data())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.second.end_date = timezone.now() - timedelta(days=1)
+        self.second.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_lazy_widgets(self):
+        response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'hype'}))
+        self.assertContains(response, "first text")
+        self.assertNotContains(response, "second text")
+        fragment_url = reverse('widget_wrapper', kwargs={'widget_id': self.second.id})
+        self.assertContains(response, 'data-src="{}"'.format(fragment_url))
+
+        response = self.client.get(fragment_url)
+        self.assertContains(response, "second text")
+        self.assertNotContains(response, "<html")
+
+
+class StreamingPageTest(PageTestCase):
+    """
+    Tests streaming long pages out widget by widget.
+    """
+    page_name = "Talent"
+    page_slug = "talent"
+
+    def setUp(self):
+        super(StreamingPageTest, self).setUp()
+        for i in range(5):
+            self.page.add_widget(TextWidget.objects.create(name="Widget {}".format(i), content="text {}".format(i)))
+
+    @override_settings(STREAMING_PAGE_SLUGS=('talent',))
+    def test_streamed(self):
+        response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'talent'}))
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        # the head and the first widgets, then one chunk per widget, then the rest of the page
+        self.assertEqual(len(chunks), 1 + 2 + 1)
+        self.assertIn("text 2", chunks[0])
+        self.assertIn("text 3", chunks[1])
+        self.assertIn("text 4", chunks[2])
+        self.assertIn("</html>", chunks[3])
+
+    def test_not_streamed(self):
+        response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'talent'}))
+        self.assertFalse(response.streaming)
+        self.assertContains(response, "text 4")
+
+
+class BatchAPITest(TestCase):
+    """
+    Tests fetching many resources of different types at once.
+    """
+
+    def setUp(self):
+        banner = BannerWidget.objects.create(name="banner", image=make_image_file(size=(2048, 1)))
+        self.events = [
+            Event.objects.create(name="Show {}".format(i), bio="A show", ticket_price=5, banner=banner,
+                                 start_time=timezone.now() + timedelta(days=i + 1))
+            for i in range(3)
+        ]
+        self.person = Person.objects.create(first_name="Funnyboy", last_name="Jones",
+                                            headshot=make_image_file(size=(100, 100)))
+
+    def get(self, ids, **kwargs):
+        return self.client.get(reverse('batch'), {'ids': ids}, **kwargs)
+
+    def test_batch(self):
+        with CaptureQueriesContext(connection) as one_event:
+            self.get('events:{};people:{}'.format(self.events[0].id, self.person.id))
+        event_ids = ','.join(str(e.id) for e in self.events)
+        with CaptureQueriesContext(connection) as many_events:
+            response = self.get('events:{},9999;people:{}'.format(event_ids, self.person.id))
+        self.assertEqual(len(one_event), len(many_events))
+        data = json.loads(response.content.decode())
+        for event in self.events:
+            self.assertEqual(data['events'][str(event.id)],
+                             json.loads(json.dumps(Event.objects.get(pk=event.pk).to_data(), cls=DjangoJSONEncoder)))
+        self.assertIsNone(data['events']['9999'])
+        self.assertEqual(data['people'][str(self.person.id)]['name'], "Funnyboy Jones")
+
+        self.assertEqual(self.get('events:{}'.format(self.events[0].id),
+                                  HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.get('events:{},9999;people:{}'.format(event_ids, self.person.id),
+                                  HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_bad_ids(self):
+        self.assertEqual(self.get('shows:1').status_code, 400)
+        self.assertEqual(self.get('events:one').status_code, 400)
+
+
+class GroupWidgetItemsTest(TestCase):
+    """
+    Tests paging through a group widget's items, and asking for just some of their fields.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.people = [
+            Person.objects.create(first_name="Person {}".format(i), last_name="Jones", bio="A" * 1000,
+                                  headshot=make_image_file(size=(100, 100)))
+            for i in range(5)
+        ]
+        self.widget = PeopleWidget.objects.create(name="People")
+        self.widget.people.add(*self.people)
+        self.page = Page.objects.create(name="Talent", slug="talent")
+        self.page.add_widget(self.widget)
+
+    def get(self, url_name, **params):
+        kwargs = {'widget_id': self.widget.id} if url_name == 'widget' else {'page_id': self.page.id}
+        response = self.client.get(reverse(url_name, kwargs=kwargs), params)
+        return response, json.loads(response.content.decode())
+
+    def get_items(self, **params):
+        response, data = self.get('widget', **params)
+        return data
+
+    def test_paging(self):
+        first = self.get_items(items_limit=2)
+        self.assertEqual([item['id'] for item in first['items']], [p.id for p in self.people[:2]])
+        second = self.get_items(items_limit=2, items_cursor=first['items_cursor'])
+        self.assertEqual([item['id'] for item in second['items']], [p.id for p in self.people[2:4]])
+        last = self.get_items(items_limit=2, items_cursor=second['items_cursor'])
+        self.assertEqual([item['id'] for item in last['items']], [self.people[4].id])
+        self.assertIsNone(last['items_cursor'])
+
+        # without any options, everything as before
+        self.assertEqual(len(self.get_items()['items']), 5)
+        self.assertNotIn('items_cursor', self.get_items())
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_items(fields='id,name,image')
+        self.assertEqual(data['items'][0], {
+            'id': self.people[0].id, 'name': "Person 0 Jones", 'image': self.people[0].headshot.url,
+        })
+        items_query = [q['sql'] for q in queries if 'people_person' in q['sql'] and 'headshot' in q['sql']][-1]
+        self.assertNotIn('bio', items_query)
+
+    def test_page(self):
+        response, data = self.get('page', items_limit=1, fields='id')
+        self.assertEqual(data['widgets'][0]['items'], [{'id': self.people[0].id}])
+        self.assertTrue(data['widgets'][0]['items_cursor'])
+
+        # the published page is untouched
+        response, data = self.get('page')
+        self.assertEqual(len(data['widgets'][0]['items']), 5)
+
+    def test_validators(self):
+        response, data = self.get('widget', items_limit=2)
+        etag = response['ETag']
+        response, data = self.get('widget')
+        self.assertNotEqual(response['ETag'], etag)
+
+        url = reverse('widget', kwargs={'widget_id': self.widget.id})
+        self.assertEqual(self.client.get(url, {'items_limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.people[0].bio = "Funny"
+        self.people[0].save()
+        self.assertEqual(self.client.get(url, {'items_limit': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_options(self):
+        self.assertEqual(self.get('widget', items_limit=0)[0].status_code, 400)
+        self.assertEqual(self.get('widget', items_limit='lots')[0].status_code, 400)
+        self.assertEqual(self.get('widget', items_cursor='nonsense')[0].status_code, 400)
+        self.assertEqual(self.get('page', items_cursor='nonsense')[0].status_code, 400)
+
+
+class NormalizedFormatTest(PageTestCase):
+    """
+    Tests the normalized API format, where each entity is given once and referred to by id.
+    """
+    page_name = "Classes"
+    page_slug = "classes"
+
+    def setUp(self):
+        super(NormalizedFormatTest, self).setUp()
+        self.teacher = Person.objects.create(first_name="Funnyboy", last_name="Jones",
+                                             headshot=make_image_file(size=(100, 100)))
+        self.house_team = HouseTeam.objects.create(name="The Apes")
+        HouseTeamMembership.objects.create(person=self.teacher, house_team=self.house_team)
+        self.classes = [
+            ApeClass.objects.create(name="Improv {}".format(i), bio="Yes and", class_type="IMPROV",
+                                    banner=self.banner, teacher=self.teacher, price=Decimal('100.00'),
+                                    start_date=timezone.now() + timedelta(days=i + 1))
+            for i in range(2)
+        ]
+        classes_widget = ApeClassesWidget.objects.create(name="Classes")
+        classes_widget.ape_classes.add(*self.classes)
+        self.page.add_widget(classes_widget)
+        self.page.add_widget(PersonFocusWidget.objects.create(name="Teacher", person=self.teacher))
+        self.page.add_widget(HouseTeamFocusWidget.objects.create(name="Troop", house_team=self.house_team))
+
+    def get(self, **params):
+        response = self.client.get(reverse('page', kwargs={'page_id': self.page.id}), params)
+        return response, json.loads(response.content.decode())
+
+    def test_normalized(self):
+        nested_response, nested = self.get()
+        response, data = self.get(format='normalized')
+        self.assertNotEqual(response['ETag'], nested_response['ETag'])
+
+        classes, person, house_team = data['widgets']
+        self.assertEqual(classes['items'], [c.id for c in self.classes])
+        self.assertEqual(person['person'], self.teacher.id)
+        self.assertEqual(house_team['house_team'], self.house_team.id)
+
+        self.assertEqual(set(data['classes']), {str(c.id) for c in self.classes})
+        self.assertEqual(data['classes'][str(self.classes[0].id)]['teacher'], self.teacher.id)
+        # the teacher is given once, with everything any of the widgets had for them
+        self.assertEqual(list(data['people']), [str(self.teacher.id)])
+        teacher = data['people'][str(self.teacher.id)]
+        self.assertEqual(teacher['bio'], nested['widgets'][1]['person']['bio'])
+        self.assertEqual(teacher['house_teams'], [self.house_team.id])
+        self.assertEqual(data['house_teams'][str(self.house_team.id)]['performers'], [self.teacher.id])
+        self.assertEqual(data['events'], {})
+
+    def test_widget(self):
+        widget_id = self.page.active_widgets()[0].id
+        response = self.client.get(reverse('widget', kwargs={'widget_id': widget_id}), {'format': 'normalized'})
+        data = json.loads(response.content.decode())
+        self.assertEqual(data['items'], [c.id for c in self.classes])
+        self.assertEqual(list(data['people']), [str(self.teacher.id)])
+
+    def test_video(self):
+        # videos have their id in the nested format too, or they couldn't be given by it here
+        video = Video.objects.create(name="Sketch", video_file=ContentFile(b'video', name='sketch.mp4'))
+        self.page.add_widget(VideoFocusWidget.objects.create(name="Video", video=video))
+        self.assertEqual(self.get()[1]['widgets'][-1]['video']['id'], video.id)
+        data = self.get(format='normalized')[1]
+        self.assertEqual(data['widgets'][-1]['video'], video.id)
+        self.assertEqual(data['videos'][str(video.id)]['name'], "Sketch")
+
+    def test_bad_format(self):
+        self.assertEqual(self.get(format='xml')[0].status_code, 400)
+
+
+class EncoderTest(TestCase):
+    """
+    Tests the JSON encoders the API can use.
+    """
+
+    def setUp(self):
+        self.data = {
+            'name': "Caf\u00e9 Improv",
+            'start_time': timezone.localtime(timezone.now()),
+            'utc_time': datetime(2018, 5, 1, 20, 30, 15, 123456, tzinfo=timezone.utc),
+            'date': date(2018, 5, 1),
+            'price': Decimal('10.50'),
+            'items': [{'id': 1, 'tags': ('a', 'b')}, None, True, 1.5],
+        }
+
+    def test_same_json(self):
+        self.assertEqual(encoders.DjangoEncoder().encode(self.data),
+                         json.dumps(self.data, cls=DjangoJSONEncoder).encode('utf-8'))
+        expected = json.loads(encoders.DjangoEncoder().encode(self.data).decode('utf-8'))
+        for encoder in (encoders.CompactEncoder(), encoders.UTF8Encoder()):
+            self.assertEqual(json.loads(encoder.encode(self.data).decode('utf-8')), expected)
+        self.assertIn("Caf\u00e9".encode('utf-8'), encoders.UTF8Encoder().encode(self.data))
+
+    def test_configured_encoder(self):
+        with self.settings(API_JSON_ENCODER='pages.encoders.DjangoEncoder'):
+            self.assertIn(b'"price": "10.50"', JSONHttpResponse(self.data).content)
+        with self.settings(API_JSON_ENCODER='pages.encoders.CompactEncoder'):
+            self.assertIn(b'"price":"10.50"', JSONHttpResponse(self.data).content)
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_json', items=5, number=1, repeat=1, stdout=out)
+        self.assertIn('pages.encoders.CompactEncoder', out.getvalue())
+
+
+class WidgetDependencyTest(TestCase):
+    """
+    Tests that widgets built from other models get new cache keys when, and only when, those rows change.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.person1 = Person.objects.create(first_name="Funnyboy", last_name="Jones",
+                                             headshot=make_image_file(size=(100, 100)))
+        self.person2 = Person.objects.create(first_name="Lisa", last_name="Crackemups",
+                                             headshot=make_image_file(size=(100, 100)))
+        self.page = Page.objects.create(name="Talent", slug="talent")
+
+    def get_cache_key(self, widget):
+        """
+        Serializes the page (recording what its widgets depend on) and returns a fresh cache key for widget
+        """
+        self.page.to_data()
+        return Widget.objects.get_subclass(id=widget.id).cache_key
+
+    def test_handpicked_people(self):
+        widget = PeopleWidget.objects.create(name="Some people")
+        widget.people.add(self.person1)
+        self.page.add_widget(widget)
+        cache_key = self.get_cache_key(widget)
+
+        self.person2.bio = "Not in the widget"
+        self.person2.save()
+        self.assertEqual(cache_key, self.get_cache_key(widget))
+
+        self.person1.bio = "In the widget"
+        self.person1.save()
+        new_cache_key = self.get_cache_key(widget)
+        self.assertNotEqual(cache_key, new_cache_key)
+
+        # people embed their house teams
+        house_team = HouseTeam.objects.create(name="The Goof Troop")
+        HouseTeamMembership.objects.create(person=self.person1, house_team=house_team)
+        cache_key = self.get_cache_key(widget)
+        self.assertNotEqual(new_cache_key, cache_key)
+        house_team.name = "The Goofier Troop"
+        house_team.save()
+        self.assertNotEqual(cache_key, self.get_cache_key(widget))
+
+    def test_upcoming_events(self):
+        banner = BannerWidget.objects.create(name="banner", image=make_image_file(size=(2048, 1)))
+        widget = EventsWidget.objects.create(name="Upcoming Shows", upcoming_events=True)
+        self.page.add_widget(widget)
+        cache_key = self.get_cache_key(widget)
+
+        # any new event could be upcoming
+        Event.objects.create(name="New Show", bio="New!", ticket_price=5, banner=banner,
+                             start_time=timezone.now() + timedelta(days=1))
+        self.assertNotEqual(cache_key, self.get_cache_key(widget))
+
+    def test_focus_widget(self):
+        widget = PersonFocusWidget.objects.create(name="Funnyboy Jones", person=self.person1)
+        self.page.add_widget(widget)
+        cache_key = self.get_cache_key(widget)
+
+        self.person2.save()
+        self.assertEqual(cache_key, self.get_cache_key(widget))
+        self.person1.save()
+        self.assertNotEqual(cache_key, self.get_cache_key(widget))
+
+    def test_person_deleted(self):
+        # house teams include their performers, whose memberships go before the person does
+        house_team = HouseTeam.objects.create(name="The Goof Troop")
+        for person in (self.person1, self.person2):
+            HouseTeamMembership.objects.create(person=person, house_team=house_team)
+        widget = HouseTeamFocusWidget.objects.create(name="The Goof Troop", house_team=house_team)
+        self.page.add_widget(widget)
+        cache_key = self.get_cache_key(widget)
+
+        # even without the memberships' own signals
+        post_delete.disconnect(signals.membership_changed, sender=HouseTeamMembership)
+        self.addCleanup(post_delete.connect, signals.membership_changed, sender=HouseTeamMembership)
+        self.person1.delete()
+        self.assertNotEqual(cache_key, self.get_cache_key(widget))
+
+    def test_dependents(self):
+        first = PeopleWidget.objects.create(name="First people")
+        first.people.add(self.person1)
+        second = PersonFocusWidget.objects.create(name="Funnyboy Jones", person=self.person1)
+        for widget in (first, second):
+            self.page.add_widget(widget)
+        self.page.to_data()
+        self.assertEqual(dependencies.invalidate(Person, self.person1.pk), {first.pk, second.pk})
+
+        # a widget that's no longer built from a row is dropped from its dependents
+        second.person = self.person2
+        second.save()
+        Page.objects.get(pk=self.page.pk).to_data()
+        self.assertEqual(dependencies.invalidate(Person, self.person1.pk), {first.pk})
+        self.assertEqual(dependencies.invalidate(Person, self.person2.pk), {second.pk})
+
+
+class PageSerializationTest(TestCase):
+    """
+    Tests that serializing a page takes the same number of queries however many items its widgets show.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.banner = BannerWidget.objects.create(name="banner", image=make_image_file(size=(2048, 1)))
+        carousel = ImageCarouselWidget.objects.create(name="Troop Photos")
+        ImageCarouselItem.objects.create(carousel=carousel, sort_order=0, image=make_image_file(),
+                                         link_type=ContentType.objects.get_for_model(Page), link_id=1)
+        self.house_team = HouseTeam.objects.create(name="The Goof Troop", logo=self.banner, image_carousel=carousel)
+
+        self.page = Page.objects.create(name="Home", slug="home")
+        self.events = EventsWidget.objects.create(name="Shows")
+        self.people = PeopleWidget.objects.create(name="Talent")
+        self.page.add_widget(self.events)
+        self.page.add_widget(self.people)
+        self.page.add_widget(ApeClassesWidget.objects.create(name="Classes", class_type="IMPROV"))
+        self.page.add_widget(HouseTeamFocusWidget.objects.create(name="Troop", house_team=self.house_team))
+        self.page.add_widget(carousel)
+
+    def add_items(self, count):
+        for i in range(count):
+            person = Person.objects.create(first_name="Funny", last_name=str(i), headshot=make_image_file())
+            HouseTeamMembership.objects.create(person=person, house_team=self.house_team)
+            self.people.people.add(person)
+            self.events.events.add(Event.objects.create(
+                name="Show", bio="A show", ticket_price=5, banner=self.banner,
+                start_time=timezone.now() + timedelta(days=i + 1)
+            ))
+            ApeClass.objects.create(name="Improv", bio="Yes and", class_type="IMPROV", banner=self.banner,
+                                    teacher=person, price=Decimal('100.00'))
+
+    def count_queries(self):
+        page = Page.objects.get(pk=self.page.pk)
+        with CaptureQueriesContext(connection) as queries:
+            data = page.to_data()
+        return len(queries), data
+
+    def test_query_count(self):
+        self.add_items(1)
+        few_queries, data = self.count_queries()
+        self.assertEqual([len(w.get('items', [])) for w in data['widgets']], [1, 1, 1, 0, 0])
+
+        self.add_items(4)
+        many_queries, data = self.count_queries()
+        self.assertEqual([len(w.get('items', [])) for w in data['widgets']], [5, 5, 5, 0, 0])
+        self.assertEqual(len(data['widgets'][3]['house_team']['performers']), 5)
+        self.assertEqual(few_queries, many_queries)
+
+
+class PageSnapshotTest(PageTestCase):
+    """
+    Tests serving pages from their published snapshots.
+    """
+    page_name = "Talent"
+    page_slug = "talent"
+
+    def setUp(self):
+        super(PageSnapshotTest, self).setUp()
+        self.person = Person.objects.create(first_name="Funnyboy", last_name="Jones",
+                                            headshot=make_image_file(size=(100, 100)))
+        self.widget = PeopleWidget.objects.create(name="Some people")
+        self.widget.people.add(self.person)
+        self.page.add_widget(self.widget)
+
+    def test_served_from_snapshot(self):
+        self.assertFalse(PageSnapshot.objects.exists())
+        response = self.client.get('/api/talent.json')
+        self.assertEqual(response.content.decode(), PageSnapshot.objects.get(page=self.page).data)
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/talent.json')
+        with self.assertNumQueries(1):
+            self.client.get('/api/{}.json'.format(self.page.id))
+
+    def test_expired_on_change(self):
+        self.client.get('/api/talent.json')
+        self.person.bio = "Very funny"
+        self.person.save()
+        self.assertFalse(PageSnapshot.objects.exists())
+        self.assertContains(self.client.get('/api/talent.json'), "Very funny")
+
+        self.widget.name = "Funny people"
+        self.widget.save()
+        self.assertFalse(PageSnapshot.objects.exists())
+        self.assertContains(self.client.get('/api/talent.json'), "Funny people")
+
+    def test_stale_publish(self):
+        # a request that read the page before a change was published doesn't replace what was published
+        read = timezone.now()
+        self.person.bio = "Very funny"
+        self.person.save()
+        published = snapshots.publish(self.page)
+        self.assertEqual(snapshots.publish(self.page, now=read).generated, published.generated)
+        self.assertEqual(PageSnapshot.objects.get(page=self.page).generated, published.generated)
+
+        # later ones do
+        self.assertGreater(snapshots.publish(self.page).generated, published.generated)
+        self.assertEqual(PageSnapshot.objects.count(), 1)
+
+    def test_expired_on_schedule(self):
+        self.page.add_widget(TextWidget.objects.create(name="later", content="Coming soon",
+                                                       start_date=timezone.now() + timedelta(hours=1)))
+        self.assertNotContains(self.client.get('/api/talent.json'), "Coming soon")
+        snapshot = PageSnapshot.objects.get(page=self.page)
+        self.assertFalse(snapshot.is_expired())
+        self.assertTrue(snapshot.is_expired(snapshot.expires))
+
+
+class ExportStaticTest(PageTestCase):
+    """
+    Tests exporting the public site to static files.
+    """
+    page_name = "Home"
+    page_slug = "home"
+
+    def setUp(self):
+        super(ExportStaticTest, self).setUp()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        Page.objects.create(name='Secret', slug='hype', draft=True)
+        self.event = self.make_event()
+
+    def export(self):
+        call_command('export_static', output=self.output, host='testserver', stdout=StringIO(), stderr=StringIO())
+        with open(os.path.join(self.output, '.export_manifest.json')) as f:
+            return json.load(f)
+
+    def test_export(self):
+        manifest = self.export()
+        event_url = '/events/{}'.format(self.event.id)
+        self.assertEqual(manifest['/home']['path'], 'home/index.html')
+        self.assertEqual(manifest['/api/home.json']['path'], 'api/home.json')
+        self.assertNotIn('/hype', manifest)
+        with io.open(os.path.join(self.output, manifest[event_url]['path']), encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn("A show", html)
+        self.assertNotIn("csrfmiddlewaretoken' value", html)
+
+        # only what's changed is exported again
+        os.utime(os.path.join(self.output, 'home/index.html'), (0, 0))
+        self.event.bio = "A funnier show"
+        self.event.save()
+        manifest = self.export()
+        self.assertEqual(os.path.getmtime(os.path.join(self.output, 'home/index.html')), 0)
+        with io.open(os.path.join(self.output, manifest[event_url]['path']), encoding='utf-8') as f:
+            self.assertIn("A funnier show", f.read())
+
+        # and whatever's gone is removed
+        path = manifest[event_url]['path']
+        self.event.delete()
+        self.assertNotIn(event_url, self.export())
+        self.assertFalse(os.path.exists(os.path.join(self.output, path)))
+        self.assertFalse(os.path.exists(os.path.join(self.output, path + '.gz')))
+
+    def test_compressed_files(self):
+        manifest = self.export()
+        path = os.path.join(self.output, manifest['/api/home.json']['path'])
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), f.read())
+
+
+class CompressionTest(PageTestCase):
+    """
+    Tests compressing responses once per version.
+    """
+    page_name = "Home"
+    page_slug = "home"
+
+    def setUp(self):
+        super(CompressionTest, self).setUp()
+        self.page.add_widget(TextWidget.objects.create(name="Text", content="Funny " * 100))
+
+    def get(self, accept_encoding, **kwargs):
+        return self.client.get(self.page.get_api_url(), HTTP_ACCEPT_ENCODING=accept_encoding, **kwargs)
+
+    def test_gzip(self):
+        plain = self.get('')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with patch('pages.compression.compress', side_effect=compression.compress) as compress:
+            response = self.get('gzip, deflate')
+            self.assertEqual(self.get('gzip;q=1.0, br;q=0').content, response.content)
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], plain['ETag'])
+        self.assertTrue(response['ETag'].startswith('W/'))
+        not_modified = self.get('gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    @skipIf(compression.brotli is None, "brotli isn't installed")
+    def test_brotli(self):
+        plain = self.get('')
+        response = self.get('gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    def test_accepted_encoding(self):
+        self.assertEqual(compression.accepted_encoding('gzip'), 'gzip')
+        self.assertEqual(compression.accepted_encoding('*'), compression.encodings()[0])
+        self.assertIsNone(compression.accepted_encoding('gzip;q=0, identity'))
+        self.assertIsNone(compression.accepted_encoding(''))
+
+
+class MinifyTest(PageTestCase):
+    """
+    Tests minifying html once, where it's produced, rather than on every response.
+    """
+
+    def test_minify(self):
+        html = """<ul>
+            <li>  Funny   show </li>  <!-- not for visitors -->
+            <!--[if lt IE 9]>  <script src="old.js"></script>  <![endif]-->
+        </ul>
+        <pre>  keep
+   this  </pre><script>
+    var a = 1;
+</script>"""
+        self.assertEqual(minify.minify(html),
+                         '<ul> <li> Funny show </li> <!--[if lt IE 9]>  <script src="old.js"></script>  <![endif]--> '
+                         '</ul> <pre>  keep\n   this  </pre><script>\n    var a = 1;\n</script>')
+
+    def test_page(self):
+        cache.clear()
+        page = Page.objects.create(name="Home", slug="home")
+        page.add_widget(TextWidget.objects.create(name="Text", content="Funny\n\n\n     show"))
+        with patch('htmlmin.middleware.html_minify') as html_minify:
+            response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'home'}))
+        self.assertFalse(html_minify.called)
+        html = response.content.decode('utf-8')
+        self.assertNotIn('\n\n', html.split('<script')[0])
+        self.assertIn('Funny show', html)
+
+    def test_event_page(self):
+        # event, class & people pages aren't minified as they're loaded, so they're left to htmlmin
+        event = self.make_event("Big Show", bio="Funny\n\n\n     show")
+        response = self.client.get(reverse('event_wrapper', kwargs={'event_id': event.id}), follow=True)
+        self.assertEqual(response.status_code, 200)
+        html = re.sub(r'<script.*?</script>', '', response.content.decode('utf-8'), flags=re.DOTALL)
+        self.assertNotIn('\t', html)
+        self.assertNotIn('\n\n', html)
+
+    def test_templates(self):
+        # only the site's page & widget templates are minified, the admin's and emails' are left alone
+        self.assertTrue(minify.is_minified_template('widgets/text.html'))
+        self.assertTrue(minify.is_minified_template('pages/page.html'))
+        self.assertFalse(minify.is_minified_template('admin/base.html'))
+        self.assertFalse(minify.is_minified_template('events/event.html'))
+        self.assertFalse(minify.is_minified_template('registration/activation_email.html'))
+
+
+class SlugIndexTest(TestCase):
+    """
+    Tests turning away urls that aren't a page's slug before any database work.
+    """
+
+    def setUp(self):
+        cache.clear()
+        Page.objects.create(name="Shows", slug="shows")
+
+    def test_unknown_slugs(self):
+        self.client.get('/shows')
+        for url in ['/wp-login.php', '/xmlrpc.php', '/no/such/page/', reverse('page', kwargs={'page_slug': 'nope'})]:
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+
+    def test_known_slugs(self):
+        self.assertEqual(self.client.get('/shows').status_code, 200)
+        self.assertEqual(self.client.get('/shows/').status_code, 200)
+        self.assertEqual(self.client.get('/hype').status_code, 404)
+        Page.objects.create(name="Hype", slug="hype")
+        self.assertEqual(self.client.get('/hype').status_code, 200)
+        self.assertEqual(self.client.get(reverse('page', kwargs={'page_slug': 'hype'})).status_code, 200)
+
+    def test_max_age(self):
+        self.assertFalse(slug_index.exists('hype'))
+        # a page this process missed the new version for, e.g. with a cache that isn't shared
+        with patch('pages.signals.slug_index.invalidate'):
+            Page.objects.create(name="Hype", slug="hype")
+        self.assertFalse(slug_index.exists('hype'))
+        with patch('pages.shared_cache.time.time', return_value=time.time() + 61):
+            self.assertTrue(slug_index.exists('hype'))
+
+
+class SlugRedirectTest(TransactionTestCase):
+    """
+    Tests redirecting to urls with slugs from the map of canonical slugs, without querying for them.
+    """
+    serialized_rollback = True
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(name="Big Show", bio="A show", ticket_price=5,
+                                          start_time=timezone.now() + timedelta(days=3))
+
+    def test_redirect(self):
+        url = '/events/{}'.format(self.event.id)
+        self.assertEqual(get_slug_redirect(url), '/events/{}/big-show'.format(self.event.id))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_slug_redirect(url), '/events/{}/big-show'.format(self.event.id))
+            self.assertFalse(get_slug_redirect(url + '/big-show'))
+        self.assertRedirects(self.client.get(url), url + '/big-show', status_code=301, fetch_redirect_response=False)
+
+        self.event.name = "Bigger Show"
+        self.event.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_slug_redirect(url + '/big-show'), '/events/{}/bigger-show'.format(self.event.id))
+
+        # a rename that's rolled back leaves the map alone
+        try:
+            with transaction.atomic():
+                self.event.name = "Biggest Show"
+                self.event.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(get_slug_redirect(url + '/bigger-show'))
+
+    def test_missing(self):
+        url = '/events/{}'.format(self.event.id)
+        self.assertTrue(get_slug_redirect(url))
+        self.event.delete()
+        with self.assertNumQueries(0):
+            self.assertFalse(get_slug_redirect(url))
+        self.assertFalse(get_slug_redirect('/events/99999'))
+        with self.assertNumQueries(0):
+            self.assertFalse(get_slug_redirect('/events/99999'))
+
+
+class WidgetTemplatesTest(TestCase):
+    """
+    Tests looking up the compiled templates for widgets.
+    """
+
+    def setUp(self):
+        widget_templates.reload()
+
+    def test_lookup(self):
+        template = widget_templates.get('text')
+        self.assertEqual(template.template.name, 'widgets/text.html')
+        self.assertIs(widget_templates.get('text'), template)
+        self.assertIsNone(widget_templates.get('no_such_widget'))
+
+        page = Page.objects.create(name='Hype', slug='hype')
+        page.add_widget(TextWidget.objects.create(name="Text Widget", content="some text"))
+        with patch('pages.widget_templates.get_template') as get_template:
+            response = self.client.get(reverse('slug_page_wrapper', kwargs={'page_slug': 'hype'}))
+        self.assertContains(response, "some text")
+        self.assertFalse(get_template.called)
+
+    @override_settings(DEBUG=True)
+    def test_debug(self):
+        with patch('pages.widget_templates.get_template') as get_template:
+            widget_templates.get('text')
+        self.assertTrue(get_template.called)
+
+
+class ScheduleTest(PageTestCase):
+    """
+    Tests working out when a page's content next changes by itself.
+    """
+
+    def setUp(self):
+        super(ScheduleTest, self).setUp()
+        self.now = timezone.now()
+
+    def test_widget_dates(self):
+        starts = self.now + timedelta(hours=2)
+        ends = self.now + timedelta(hours=3)
+        self.page.add_widget(TextWidget.objects.create(name="later", content="soon", start_date=starts))
+        self.page.add_widget(TextWidget.objects.create(name="now", content="for now", end_date=ends))
+        self.assertEqual(self.page.next_change(self.now), starts)
+        self.assertEqual(self.page.next_change(starts), ends)
+        self.assertIsNone(self.page.next_change(ends))
+
+    def test_upcoming_events(self):
+        widget = EventsWidget.objects.create(name="This week", upcoming_events=True, upcoming_events_window=7)
+        self.page.add_widget(widget)
+        midnight = schedule.next_midnight(self.now)
+        self.assertEqual(self.page.next_change(self.now), midnight)
+
+        # a show next month comes into the window a week before it starts
+        next_month = self.make_event(start_time=self.now + timedelta(days=30))
+        comes_in = next_month.start_time - timedelta(days=7)
+        before = comes_in - timedelta(minutes=1)
+        self.assertEqual(self.page.next_change(before), min(comes_in, schedule.next_midnight(before)))
+
+        # and drops out when it starts
+        soon = self.make_event(start_time=self.now + timedelta(minutes=30))
+        self.assertEqual(self.page.next_change(self.now), min(soon.start_time, midnight))
+
+    def test_cache_timeout(self):
+        self.assertEqual(schedule.cache_timeout(3600, self.now + timedelta(seconds=90), self.now), 90)
+        self.assertEqual(schedule.cache_timeout(60, self.now + timedelta(seconds=90), self.now), 60)
+        self.assertEqual(schedule.cache_timeout(60, None, self.now), 60)
+        self.assertEqual(schedule.cache_timeout(0, self.now + timedelta(seconds=90), self.now), 0)
+
+
+class EventTimelineTest(PageTestCase):
+    """
+    Tests upcoming events widgets finding their shows in the shared timeline of upcoming events.
+    """
+
+    def setUp(self):
+        super(EventTimelineTest, self).setUp()
+        self.now = timezone.now()
+        self.events = [
+            self.make_event("Show {}".format(days), start_time=self.now + timedelta(days=days, hours=1))
+            for days in [-1, 0, 2, 5, 10]
+        ]
+        self.widgets = [
+            EventsWidget.objects.create(name=name, upcoming_events=True, upcoming_events_window=window)
+            for name, window in [("Today", 1), ("This week", 7), ("Coming up", None)]
+        ]
+        for widget in self.widgets:
+            self.page.add_widget(widget)
+
+    def item_names(self):
+        return [[item["name"] for item in widget["items"]] for widget in self.page.to_data()["widgets"]]
+
+    def test_windows(self):
+        self.assertEqual(self.item_names(), [
+            ["Show 0"],
+            ["Show 0", "Show 2", "Show 5"],
+            ["Show 0", "Show 2", "Show 5", "Show 10"],
+        ])
+
+    def test_no_event_queries(self):
+        self.page.to_data()
+        with CaptureQueriesContext(connection) as queries:
+            self.page.to_data()
+            for widget in self.widgets:
+                widget.next_change(self.now)
+        self.assertFalse([q for q in queries if '"events_event"."start_time" >' in q['sql']])
+
+    def test_changes(self):
+        self.item_names()
+        self.make_event("Show 1", start_time=self.now + timedelta(days=1))
+        self.events[3].delete()
+        self.assertEqual(self.item_names()[1], ["Show 0", "Show 1", "Show 2"])
+
+        # shows drop out once they start, without the timeline being rebuilt
+        with patch('pages.models.timezone.now', return_value=self.now + timedelta(hours=2)):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.widgets[1].items[0].name, "Show 1")
+        self.assertEqual(len(queries), 1)  # whether the widget's shows are handpicked
+
+
+class AvailabilityTest(PageTestCase):
+    """
+    Tests working out which events are sold out and which classes are full, a whole set at a time.
+    """
+
+    def setUp(self):
+        super(AvailabilityTest, self).setUp()
+        self.sold_out = self.make_event("Sold Out", max_tickets=10, tickets_sold=10)
+        self.selling = self.make_event("Selling", max_tickets=10, tickets_sold=4)
+        self.unlimited = self.make_event("Unlimited", ticket_price=0, max_tickets=None)
+        self.widget = EventsWidget.objects.create(name="Upcoming Shows", upcoming_events=True)
+        self.page.add_widget(self.widget)
+
+    def test_item_data(self):
+        # widgets' items leave their seats to the counters, so selling one doesn't change the widget
+        items = self.page.to_data()["widgets"][0]["items"]
+        self.assertFalse([item for item in items if "sold_out" in item or "tickets_left" in item])
+        self.assertEqual((self.selling.to_data()["tickets_left"], self.selling.to_data()["sold_out"]), (6, False))
+        self.assertEqual(self.unlimited.to_data()["tickets_left"], None)
+
+        ape_class = ApeClass.objects.create(name="Improv 101", bio="Yes, and", price=300, max_enrollment=12,
+                                            students_registered=12)
+        self.assertEqual((ape_class.to_data()["seats_left"], ape_class.to_data()["full"]), (0, True))
+
+    def test_filters(self):
+        # the widget's items are loaded together, and remembered for the rest of the request
+        items = self.page.to_data()["widgets"][0]["items"]
+        availability.forget()
+        cache.clear()
+        with self.assertNumQueries(1):
+            load_availability(items, 'event')
+            self.assertTrue(is_sold_out(self.sold_out.id))
+            self.assertFalse(is_sold_out(str(self.selling.id)))
+            self.assertFalse(is_sold_out(self.unlimited.id))
+
+        # and rendered into the buy buttons, which the_ape.js keeps up to date on cached pages
+        html = self.client.get('/shows/').content.decode('utf-8')
+        soup = BeautifulSoup(html, 'html.parser')
+        sold_out = soup.find(attrs={'data-availability': 'events', 'data-id': str(self.sold_out.id)})
+        self.assertNotIn('display: none', sold_out.find(class_='availability-sold-out').get('style', ''))
+        self.assertIn('display: none', sold_out.find(class_='availability-open')['style'])
+
+        availability.forget()
+        cache.clear()
+        with self.assertNumQueries(1):
+            availability.load(Event, [self.sold_out.id, 99999])
+        self.assertFalse(is_sold_out(99999))
+        self.assertFalse(is_full(99999))
+
+    def test_api(self):
+        ape_class = ApeClass.objects.create(name="Improv 101", bio="Yes, and", price=300, max_enrollment=12,
+                                            students_registered=3)
+        url = '/api/availability.json?events={},{},99999&classes={}'.format(
+            self.sold_out.id, self.selling.id, ape_class.id
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {
+            "events": {
+                str(self.sold_out.id): {"tickets_sold": 10, "tickets_held": 0, "max_tickets": 10, "tickets_left": 0, "sold_out": True},
+                str(self.selling.id): {"tickets_sold": 4, "tickets_held": 0, "max_tickets": 10, "tickets_left": 6, "sold_out": False},
+                "99999": None,
+            },
+            "classes": {
+                str(ape_class.id): {"students_registered": 3, "seats_held": 0, "max_enrollment": 12, "seats_left": 9, "full": False},
+            },
+        })
+
+        # read from the counters, which are kept up to date as tickets sell
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.selling.tickets_sold = 10
+        self.selling.save()
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content.decode('utf-8'))["events"][str(self.selling.id)]["sold_out"])
+
+        self.assertEqual(self.client.get('/api/availability.json?events=one').status_code, 400)
+
+
+class InventoryTest(TransactionTestCase):
+    """
+    Tests selling seats without overselling, and keeping the seat counters in step (see
+    square_payments.tests for checkouts racing each other).
+    """
+    serialized_rollback = True
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(name="Big Show", bio="A show", ticket_price=5, max_tickets=5,
+                                          start_time=timezone.now() + timedelta(days=1))
+
+    def test_selling_leaves_widgets_alone(self):
+        self.event.banner = BannerWidget.objects.create(name="banner", image=make_image_file(size=(2048, 1)))
+        self.event.save()
+        widget = EventsWidget.objects.create(name="Upcoming Shows", upcoming_events=True)
+        widget.to_data()
+        version = dependencies.widget_version(widget.pk)
+        with patch('pages.dependencies.time.time', return_value=1234.0):
+            self.assertTrue(inventory.take(self.event))
+        self.assertEqual(dependencies.widget_version(widget.pk), version)
+        # API responses with the seats in them are still revalidated
+        self.assertEqual(dependencies.model_versions([Event]), [1234.0])
+
+    def test_take_and_release(self):
+        self.assertTrue(inventory.take(self.event, 3))
+        self.assertEqual(self.event.tickets_sold, 3)
+        self.assertEqual(availability.counts(Event, [self.event.pk]), {self.event.pk: (3, 0, 5)})
+        self.assertFalse(inventory.take(self.event, 3))
+        self.assertTrue(inventory.release(self.event, 3))
+        self.assertFalse(inventory.release(self.event, 1))
+        self.assertTrue(inventory.take(self.event, 5))
+        self.assertEqual(availability.counts(Event, [self.event.pk]), {self.event.pk: (5, 0, 5)})
+
+        # events with no limit never sell out
+        self.event.max_tickets = None
+        self.event.save()
+        self.assertTrue(inventory.take(self.event, 100))
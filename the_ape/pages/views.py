@@ -8,27 +8,37 @@ leaves the door open for us to drop in a different frontend framework at some po
 (angular, react, whatever is hip and trendy in a year). It also allows for an iOS or Android
 app to be built with very little extra work needing to be done server-side.
 """
+import hashlib
 import json
+import os
 import re
+from calendar import timegm
+from collections import OrderedDict
 
+from django.conf import settings
 from django.contrib import messages
-from django.core.serializers.json import DjangoJSONEncoder
 from django.core.urlresolvers import Resolver404, resolve
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.http.response import HttpResponsePermanentRedirect
 from django.shortcuts import render, render_to_response, get_object_or_404
+from django.template.loader import get_template, render_to_string
 from django.template.response import TemplateResponse
-from django.template import TemplateDoesNotExist, RequestContext
-from django.template.loader import get_template
+from django.template import RequestContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.safestring import mark_safe
 from django.views.generic import View, TemplateView
 
-from accounts.models import ClassMember, UserProfile, EventAttendee
+from accounts import entitlements
 from classes.models import ApeClass
 from events.models import Event
-from pages.models import Page, EventsWidget, PeopleWidget, ApeClassesWidget, \
-    ImageCarouselWidget, BannerWidget
+from pages import availability, dependencies, encoders, minify, schedule, slug_index, snapshots, widget_templates
+from pages.cache import varies_on_user, widget_cache_timeout
+from pages.normalize import normalize, response_format
+from pages.models import Page, Widget, Video, EventsWidget, PeopleWidget, ApeClassesWidget, \
+    ImageCarouselWidget, BannerWidget, GroupWidget, decode_cursor, prefetch_data, to_cache_key
 from pages.templatetags.page_tags import get_slug_redirect
 from people.models import Person, HouseTeam
 
@@ -48,25 +58,137 @@ def handler500(request):
 
 
 
+#####################################################
+# CONDITIONAL GET
+#####################################################
+def make_etag(vals):
+    return hashlib.md5(to_cache_key(vals).encode('utf-8')).hexdigest()
+
+
+def to_timestamp(moment):
+    if moment is None or moment == '':
+        return None
+    if isinstance(moment, (int, float)):
+        return int(moment)
+    return timegm(moment.utctimetuple())
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412) if the client's copy of the resource is still good, None if the resource
+    needs to be sent.
+    """
+    if request.method not in ('GET', 'HEAD') or (etag is None and last_modified is None):
+        return None
+    response = get_conditional_response(request, etag=quote_etag(etag) if etag else None, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+
+
+#####################################################
+# GROUP WIDGET ITEM OPTIONS
+#####################################################
+MAX_ITEMS_LIMIT = 100
+
+
+def item_options(request):
+    """
+    The group widget item options (see GroupWidget.to_data) asked for in the query string, e.g.
+    ?items_limit=20&items_cursor=...&fields=id,name,image. Raises ValueError if they don't make sense.
+    """
+    options = {}
+    if 'items_limit' in request.GET:
+        limit = request.GET['items_limit']
+        if not limit.isdigit() or not 0 < int(limit) <= MAX_ITEMS_LIMIT:
+            raise ValueError("items_limit has to be between 1 and {}".format(MAX_ITEMS_LIMIT))
+        options['items_limit'] = int(limit)
+    if 'items_cursor' in request.GET:
+        cursor = request.GET['items_cursor']
+        decode_cursor(cursor)
+        options['items_cursor'] = cursor
+    if 'fields' in request.GET:
+        options['item_fields'] = frozenset(filter(None, request.GET['fields'].split(',')))
+    return options
+
+
+def options_key(options):
+    return sorted((name, sorted(value) if isinstance(value, frozenset) else value) for name, value in options.items())
+
+
 #####################################################
 # JSON VIEWS
 #####################################################
 class JSONHttpResponse(HttpResponse):
     def __init__(self, content=None, *args, **kwargs):
         kwargs['content_type'] = 'application/json'
-        content = json.dumps(content, cls=DjangoJSONEncoder)
+        content = encoders.encode(content)
         super(JSONHttpResponse, self).__init__(content, *args, **kwargs)
 
 
 class JSONView(View):
+    # models whose content versions (see pages.dependencies) validate this view's resource
+    version_models = []
 
     def dispatch(self, request, *args, **kwargs):
+        etag, last_modified = None, None
+        if request.method in ('GET', 'HEAD'):
+            etag, last_modified = self.get_validators(request, *args, **kwargs)
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
         data = super(JSONView, self).dispatch(request, *args, **kwargs)
 
         if isinstance(data, HttpResponse):
-            return data
+            response = data
         else:
-            return JSONHttpResponse(data)
+            response = JSONHttpResponse(data)
+        set_validators(response, etag, last_modified)
+        return response
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        Returns an (etag, last_modified timestamp) pair for the requested resource, either of which can be
+        None. These have to be cheap to work out, since they're checked before anything is serialized.
+
+        By default they're built from the content versions of version_models, which change whenever
+        any of their rows does.
+        """
+        if not self.version_models:
+            return None, None
+        versions = dependencies.model_versions(self.version_models)
+        etag = make_etag([type(self).__name__, args, sorted(kwargs.items())] + versions)
+        return etag, to_timestamp(max(versions))
+
+    def get_data(self, request, *args, **kwargs):
+        """
+        Returns the native python data for the requested resource (real datetimes, Decimals, etc),
+        before any of it is serialized to JSON.
+        """
+        return self.get(request, *args, **kwargs)
+
+    @classmethod
+    def from_match(cls, request, resolver_match):
+        """
+        Sets up the view behind resolver_match for in-process use, so that HTML views can get
+        an API resource's native data without a JSON encode/decode round trip.
+        """
+        view_func = resolver_match.func
+        view = view_func.view_class(**view_func.view_initkwargs)
+        view.request = request
+        view.args = resolver_match.args
+        view.kwargs = resolver_match.kwargs
+        return view
 
 
 class PageView(JSONView):
@@ -75,6 +197,8 @@ class PageView(JSONView):
     def dispatch(self, request, *args, **kwargs):
         if self.request.path == 'favicon.ico':
             return HttpResponse(status_code=200)
+        if kwargs.get('page_slug') and not slug_index.exists(kwargs['page_slug']):
+            return JSONHttpResponse({'error': "No such page"}, status=404)
 
         return super(PageView, self).dispatch(request, *args, **kwargs)
 
@@ -90,47 +214,305 @@ class PageView(JSONView):
             raise Http404()
         return page
 
+    def get_snapshot(self, page_id=None, page_slug=None, **kwargs):
+        """
+        The page's published snapshot (see pages.snapshots), publishing it first if there isn't a current one.
+        """
+        if getattr(self, 'snapshot', None) is None:
+            self.snapshot = snapshots.get(page_id=page_id, page_slug=page_slug)
+            if self.snapshot is None:
+                self.snapshot = snapshots.publish(self.get_page(page_id=page_id, page_slug=page_slug))
+        return self.snapshot
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        A snapshot is published again whenever the page changes, be it by an edit to the page, its widgets
+        or anything they're built from, or at a scheduled moment (see pages.snapshots).
+        """
+        snapshot = self.get_snapshot(**kwargs)
+        try:
+            options, data_format = item_options(request), response_format(request)
+        except ValueError:
+            return None, None
+        if options or data_format != 'nested':
+            etag = make_etag([snapshot.etag, options_key(options), data_format])
+            return etag, to_timestamp(snapshot.generated)
+        return snapshot.etag, to_timestamp(snapshot.generated)
+
+    def get_data(self, request, *args, **kwargs):
+        data, self.cache_info = snapshots.native_data(self.get_snapshot(**kwargs))
+        return data
+
     def get(self, request, *args, **kwargs):
-        page = self.get_page(**kwargs)
-        page_data = page.to_data()
-        return page_data
+        try:
+            options, data_format = item_options(request), response_format(request)
+        except ValueError as e:
+            return JSONHttpResponse({'error': str(e)}, status=400)
+        if options:
+            # a page of items, or a few of their fields, isn't what's published
+            data = self.get_page(**kwargs).to_data(**options)
+            return normalize(data) if data_format == 'normalized' else data
+        if data_format == 'normalized':
+            return normalize(self.get_data(request, *args, **kwargs))
+        # the snapshot already holds the JSON, no need to encode it again
+        return HttpResponse(self.get_snapshot(**kwargs).data, content_type='application/json')
+
+
+class WidgetView(JSONView):
+    """
+    A single widget, so pages can load their widgets lazily.
+    """
+
+    def get_widget(self, widget_id):
+        if getattr(self, 'object', None) is None:
+            try:
+                widget = Widget.objects.get_subclass(id=widget_id)
+            except Widget.DoesNotExist:
+                raise Http404()
+            if not widget.is_active:
+                raise Http404()
+            dependencies.load_versions([widget])
+            self.object = widget
+            self.next_change = widget.next_change()
+        return self.object
+
+    def get_validators(self, request, widget_id):
+        widget = self.get_widget(widget_id)
+        try:
+            options, data_format = item_options(request), response_format(request)
+        except ValueError:
+            return None, None
+        etag_values = ['widget', widget.cache_key, self.next_change, data_format]
+        if options and isinstance(widget, GroupWidget):
+            # a page of items doesn't record what it's built from, so go by the item models' versions instead
+            etag_values += [options_key(options)] + dependencies.model_versions(widget.item_version_models)
+        return make_etag(etag_values), None
+
+    def get_widget_data(self, widget_id, **options):
+        widget = self.get_widget(widget_id)
+        self.cache_info = {'cache_key': widget.cache_key, 'next_change': self.next_change}
+        if options and isinstance(widget, GroupWidget):
+            return widget.to_data(**options)
+        prefetch_data([widget])
+        return widget.to_data()
+
+    def get_data(self, request, widget_id):
+        # the HTML views always render the whole widget
+        return self.get_widget_data(widget_id)
+
+    def get(self, request, widget_id):
+        try:
+            options, data_format = item_options(request), response_format(request)
+        except ValueError as e:
+            return JSONHttpResponse({'error': str(e)}, status=400)
+        data = self.get_widget_data(widget_id, **options)
+        return normalize(data) if data_format == 'normalized' else data
 
 
 class EventView(JSONView):
+    version_models = [Event, Widget]
+    queryset = Event.objects.select_related('banner')
 
     def get(self, request, event_id):
-        event = get_object_or_404(Event, pk=event_id)
+        event = get_object_or_404(self.queryset, pk=event_id)
         data = event.to_data()
         return data
 
 
 class PersonView(JSONView):
+    version_models = [Person, HouseTeam, Video]
+    queryset = Person.objects.prefetch_related(*Person.data_prefetch_related)
 
     def get(self, request, person_id):
-        person = get_object_or_404(Person, pk=person_id)
+        person = get_object_or_404(self.queryset, pk=person_id)
         data = person.to_data()
         return data
 
 
 class ApeClassView(JSONView):
+    version_models = [ApeClass, Person, HouseTeam, Video, Widget]
+    queryset = ApeClass.objects.select_related('banner', 'teacher').prefetch_related(
+        *['teacher__' + relation for relation in Person.data_prefetch_related]
+    )
 
     def get(self, request, ape_class_id):
-        ape_class = get_object_or_404(ApeClass, pk=ape_class_id)
+        ape_class = get_object_or_404(self.queryset, pk=ape_class_id)
         data = ape_class.to_data()
         return data
 
 
 class HouseTeamView(JSONView):
+    version_models = [HouseTeam, Person, Video, Widget]
+    queryset = HouseTeam.objects.prefetch_related(*HouseTeam.data_prefetch_related)
 
     def get(self, request, house_team_id):
-        house_team = get_object_or_404(HouseTeam, pk=house_team_id)
+        house_team = get_object_or_404(self.queryset, pk=house_team_id)
         data = house_team.to_data()
         return data
 
 
+class BatchView(JSONView):
+    """
+    Many events, people, classes and house teams at once, e.g. ?ids=events:1,2,3;people:7,8 returns
+
+        {"events": {"1": {...}, "2": {...}, "3": null}, "people": {"7": {...}, "8": {...}}}
+
+    with the same data as their own endpoints (null for anything that doesn't exist), in one query
+    (plus prefetches) per type.
+    """
+    max_ids = 200
+    resource_views = OrderedDict([
+        ('events', EventView),
+        ('people', PersonView),
+        ('classes', ApeClassView),
+        ('house_teams', HouseTeamView),
+    ])
+
+    def parse_ids(self, request):
+        """
+        Returns {type: [ids]} for the ids requested, raising ValueError if they don't make sense.
+        """
+        requested = OrderedDict()
+        for group in filter(None, request.GET.get('ids', '').split(';')):
+            resource_type, _, ids = group.partition(':')
+            if resource_type not in self.resource_views:
+                raise ValueError("Unknown type '{}'".format(resource_type))
+            requested.setdefault(resource_type, [])
+            for pk in filter(None, ids.split(',')):
+                if not pk.isdigit():
+                    raise ValueError("'{}' isn't an id".format(pk))
+                requested[resource_type].append(int(pk))
+        if sum(len(ids) for ids in requested.values()) > self.max_ids:
+            raise ValueError("No more than {} ids at a time".format(self.max_ids))
+        return requested
+
+    def get_validators(self, request, *args, **kwargs):
+        try:
+            requested = self.parse_ids(request)
+        except ValueError:
+            return None, None
+        version_models = []
+        for resource_type in requested:
+            version_models += [m for m in self.resource_views[resource_type].version_models if m not in version_models]
+        if not version_models:
+            return None, None
+        versions = dependencies.model_versions(version_models)
+        etag = make_etag(['batch', sorted(requested.items())] + versions)
+        return etag, to_timestamp(max(versions))
+
+    def get(self, request):
+        try:
+            requested = self.parse_ids(request)
+        except ValueError as e:
+            return JSONHttpResponse({'error': str(e)}, status=400)
+
+        data = OrderedDict()
+        for resource_type, ids in requested.items():
+            found = self.resource_views[resource_type].queryset.in_bulk(ids)
+            data[resource_type] = OrderedDict(
+                (str(pk), found[pk].to_data() if pk in found else None) for pk in ids
+            )
+        return data
+
+
+class AvailabilityView(JSONView):
+    """
+    How many seats are left for many events and classes at once, e.g. ?events=1,2&classes=3 returns
+
+        {"events": {"1": {"tickets_sold": 8, "tickets_held": 2, "max_tickets": 20, "tickets_left": 10,
+                          "sold_out": false},
+                    "2": null},
+         "classes": {"3": {"students_registered": 11, "seats_held": 1, "max_enrollment": 12, "seats_left": 0,
+                           "full": true}}}
+
+    (null for anything that doesn't exist). It's read from the seat counters in pages.availability rather
+    than the rows themselves, so pages can be cached however long and still fill in their buy buttons
+    (see the_ape.js). Browsers & proxies can reuse responses for AVAILABILITY_MAX_AGE seconds.
+    """
+    max_ids = 200
+    # the model of each type, and what its seats left & sold out are called
+    resource_models = OrderedDict([
+        ('events', (Event, 'tickets_left', 'sold_out')),
+        ('classes', (ApeClass, 'seats_left', 'full')),
+    ])
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super(AvailabilityView, self).dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'AVAILABILITY_MAX_AGE', 10))
+        return response
+
+    def parse_ids(self, request):
+        """
+        Returns {type: [ids]} for the ids requested, raising ValueError if they don't make sense.
+        """
+        requested = OrderedDict()
+        for resource_type in self.resource_models:
+            ids = [pk for pk in request.GET.get(resource_type, '').split(',') if pk]
+            for pk in ids:
+                if not pk.isdigit():
+                    raise ValueError("'{}' isn't an id".format(pk))
+            if ids:
+                requested[resource_type] = sorted({int(pk) for pk in ids})
+        if sum(len(ids) for ids in requested.values()) > self.max_ids:
+            raise ValueError("No more than {} ids at a time".format(self.max_ids))
+        return requested
+
+    def get_availability(self, request):
+        if not hasattr(self, '_availability'):
+            data = OrderedDict()
+            for resource_type, ids in self.parse_ids(request).items():
+                model, seats_left_name, sold_out_name = self.resource_models[resource_type]
+                counts = availability.counts(model, ids)
+                data[resource_type] = OrderedDict()
+                for pk in ids:
+                    if pk not in counts:
+                        data[resource_type][str(pk)] = None
+                        continue
+                    seats = availability.availability(*counts[pk])
+                    data[resource_type][str(pk)] = OrderedDict(zip(model.availability_fields, counts[pk]))
+                    data[resource_type][str(pk)].update([
+                        (seats_left_name, seats.seats_left),
+                        (sold_out_name, seats.sold_out),
+                    ])
+            self._availability = data
+        return self._availability
+
+    def get_validators(self, request, *args, **kwargs):
+        # the counts are cheap to get, so the ETag is made from the response itself
+        try:
+            return make_etag(['availability', self.get_availability(request)]), None
+        except ValueError:
+            return None, None
+
+    def get(self, request):
+        try:
+            return self.get_availability(request)
+        except ValueError as e:
+            return JSONHttpResponse({'error': str(e)}, status=400)
+
+
 #####################################################
 # HTML VIEWS
 #####################################################
+_templates_version = None
+
+
+def templates_version():
+    """
+    The last time any of our templates changed on disk, so that deploying new templates gets
+    every HTML page a new ETag.
+    """
+    global _templates_version
+    if _templates_version is None:
+        mtimes = [0]
+        for template_dir in widget_templates.template_dirs():
+            for root, dirs, files in os.walk(template_dir):
+                mtimes += [os.path.getmtime(os.path.join(root, f)) for f in files]
+        _templates_version = int(max(mtimes))
+    return _templates_version
+
+
 REDIRECT_NEEDED_URL_PATTERNS = [
     'ape_class',
     'event',
@@ -140,10 +522,16 @@ REDIRECT_NEEDED_URL_PATTERNS = [
 ]
 
 
+STREAM_MARKER = mark_safe('<!-- stream widgets here -->')
+
+
 class WebPageWrapperView(TemplateView):
     template_name = "pages/page.html"
     context_object_name = "page"
     url_namespace = 'pages.api_urls'
+    # whether to stream the page out widget by widget, and how many widgets to send up front if so
+    streaming = False
+    eager_widgets = 3
 
     def get_api_url(self, page_path, *args, **kwargs):
         return u"/pages/" + page_path.strip('/') + u".json"
@@ -153,8 +541,9 @@ class WebPageWrapperView(TemplateView):
         Base class view for all HTML views.
 
         A fair bit is happening here. The WebPageWrapperView parses a url request, like '/shows', 
-        calculates the API endpoint that web request corresponds to, e.g. 'shows.json', issues a GET 
-        to that url, loads the received JSON and passes that data to the template.
+        calculates the API endpoint that web request corresponds to, e.g. 'shows.json', runs the view 
+        behind that url in-process and passes the data it returns to the template. The data is the same 
+        structure the API would serialize, just without the trip through JSON.
 
         It also appends a slug to the resulting url if needed, for SEO purposes.
         """
@@ -172,31 +561,133 @@ class WebPageWrapperView(TemplateView):
             if redirect_url:
                 return HttpResponsePermanentRedirect(redirect_url)  # uses a 301 instead of 302 code
 
-        response = resolver_match.func(request, *resolver_match.args, **resolver_match.kwargs)
-        if response.status_code >= 400:
-            return response
-
-        # working solution
-        if isinstance(response, TemplateResponse):
-            response.render()
-
-        self.page_data = json.loads(response.content.decode())
-        for widget in self.page_data.get('widgets', []):
-            template_name = "widgets/{}.html".format(widget['type'])
-            try:
-                get_template(template_name)
-            except TemplateDoesNotExist:
-                pass
-            else:
-                widget['template_name'] = template_name
+        view_class = getattr(resolver_match.func, 'view_class', None)
+        if view_class is not None and issubclass(view_class, JSONView):
+            # render straight from the resource's native data, no need to go through JSON
+            api_view = view_class.from_match(request, resolver_match)
+            etag, last_modified = self.get_validators(request, api_view, resolver_match)
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            self.page_data = api_view.get_data(request, *resolver_match.args, **resolver_match.kwargs)
+            if isinstance(self.page_data, HttpResponse):
+                return self.page_data
+            if getattr(api_view, 'cache_info', None) is not None:
+                self.add_cache_info(api_view.cache_info)
+        else:
+            response = resolver_match.func(request, *resolver_match.args, **resolver_match.kwargs)
+            if response.status_code >= 400:
+                return response
+
+            # working solution
+            if isinstance(response, TemplateResponse):
+                response.render()
+
+            self.page_data = json.loads(response.content.decode())
+
+        lazy_after = self.page_data.get('server_rendered_widgets')
+        for i, widget in enumerate(self.page_data.get('widgets', [])):
+            widget['template'] = widget_templates.get(widget['type'])
+            widget['lazy'] = lazy_after is not None and i >= lazy_after
+            widget['per_user'] = varies_on_user(widget['type'])
+        # a page showing anything about the visitor is cached per visitor too
+        self.page_data['per_user'] = any(widget['per_user'] for widget in self.page_data.get('widgets', []))
+
+        response = super(WebPageWrapperView, self).dispatch(request, *args, **kwargs)
+        if view_class is not None and issubclass(view_class, JSONView):
+            set_validators(response, etag, last_modified)
+        return response
+
+    def get_validators(self, request, api_view, resolver_match):
+        """
+        The HTML for a page is built from the API resource, but it also depends on our templates, the
+        date (show times are shown as TODAY/Tomorrow), who's logged in and their CSRF token, so those go
+        into its ETag too. Nothing is validated while there are messages waiting to be shown, since those
+        are rendered into the page.
+        """
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return None, None
+        etag, last_modified = api_view.get_validators(request, *resolver_match.args, **resolver_match.kwargs)
+        if etag is None:
+            return None, None
+        today = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        user_id = request.user.pk if request.user.is_authenticated else None
+        csrf_token = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        etag = make_etag([etag, type(self).__name__, templates_version(), today.date(), user_id, csrf_token])
+        if last_modified is not None:
+            last_modified = max(last_modified, templates_version(), to_timestamp(today))
+        return etag, last_modified
+
+    def add_cache_info(self, cache_info):
+        """
+        Adds the keys & timeouts page.html uses to cache the rendered page and each of its widgets.
 
-        return super(WebPageWrapperView, self).dispatch(request, *args, **kwargs)
+        A widget's key changes whenever the widget, or anything it was built from, does (see
+        pages.dependencies). The page's key is built from its own key plus those of its widgets,
+        so editing anything shown on the page gets it a fresh fragment. Both expire no later than
+        the next time their content changes on its own (see pages.schedule). The keys are worked
+        out when the page's snapshot is published (see pages.snapshots).
+        """
+        now = timezone.now()
+        for widget_info, widget_data in zip(cache_info['widgets'], self.page_data['widgets']):
+            widget_data['cache_key'] = widget_info['cache_key']
+            widget_data['cache_timeout'] = schedule.cache_timeout(
+                widget_cache_timeout(widget_data['type']), widget_info['next_change'], now
+            )
+
+        self.page_data['cache_key'] = cache_info['cache_key']
+        self.page_data['cache_timeout'] = schedule.cache_timeout(
+            cache_info['cache_timeout'], cache_info['next_change'], now
+        )
 
     def get_context_data(self, **kwargs):
         context = super(WebPageWrapperView, self).get_context_data(**kwargs)
         context[self.context_object_name] = self.page_data
         return context
 
+    def is_streaming(self):
+        return self.streaming
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.is_streaming() and self.page_data.get('widgets'):
+            return self.stream_response(context)
+        response = super(WebPageWrapperView, self).render_to_response(context, **response_kwargs)
+        # pages & widgets are rendered from minified templates & fragments (see pages.minify), there's
+        # nothing left for the minify middleware to do. It would also wrap widget fragments up in a whole
+        # html document. The event, class & people pages are still left to it.
+        if all(minify.is_minified_template(name) for name in self.get_template_names()):
+            response.minify_response = False
+        return response
+
+    def stream_response(self, context):
+        """
+        Sends everything up to and including the first few widgets straight away, then each of the rest
+        of the widgets as it's rendered.
+
+        Everything but the remaining widgets is rendered before the response is returned, so messages
+        are used up and the CSRF cookie is set as usual. Like any other page, it's minified already.
+        """
+        widgets = self.page_data['widgets']
+        context[self.context_object_name] = dict(self.page_data, widgets=widgets[:self.eager_widgets])
+        context['stream_marker'] = STREAM_MARKER
+        html = render_to_string(self.get_template_names(), context, request=self.request)
+        head, marker, tail = html.partition(STREAM_MARKER)
+        if not marker:
+            # this template doesn't stream its widgets
+            return HttpResponse(html)
+
+        widget_template = get_template('pages/widget.html')
+
+        def stream():
+            yield head
+            for widget in widgets[self.eager_widgets:]:
+                yield widget_template.render({'widget': widget, 'page': self.page_data}, self.request)
+            yield tail
+
+        response = StreamingHttpResponse(stream(), content_type='text/html; charset=utf-8')
+        response.minify_response = False
+        return response
+
 
 class PageIDWrapperView(WebPageWrapperView):
 
@@ -207,10 +698,46 @@ class PageIDWrapperView(WebPageWrapperView):
 class SlugPageWrapperView(WebPageWrapperView):
     page_slug = None
 
+    def dispatch(self, request, *args, **kwargs):
+        # this is the catch-all url, so anything that isn't a page's slug is turned away before any db work
+        page_slug = (kwargs.get('page_slug') or self.page_slug or '').strip('/')
+        if not slug_index.exists(page_slug):
+            return slug_index.not_found()
+        if kwargs.get('page_slug'):
+            kwargs['page_slug'] = self.kwargs['page_slug'] = page_slug
+        return super(SlugPageWrapperView, self).dispatch(request, *args, **kwargs)
+
     def get_api_url(self, page_slug=None, *args, **kwargs):
         page_slug = page_slug or self.page_slug
         return reverse('page', kwargs={'page_slug': page_slug}, urlconf='pages.api_urls')
 
+    def is_streaming(self):
+        page_slug = self.kwargs.get('page_slug') or self.page_slug
+        return self.streaming or page_slug in getattr(settings, 'STREAMING_PAGE_SLUGS', ())
+
+
+class WidgetWrapperView(WebPageWrapperView):
+    """
+    The html for a single widget, for pages to load lazily as the visitor scrolls down to it.
+    """
+    template_name = "pages/widget.html"
+    context_object_name = "widget"
+
+    def get_api_url(self, widget_id, *args, **kwargs):
+        return reverse('widget', kwargs={'widget_id': widget_id}, urlconf='pages.api_urls')
+
+    def add_cache_info(self, cache_info):
+        self.page_data['cache_key'] = cache_info['cache_key']
+        self.page_data['cache_timeout'] = schedule.cache_timeout(
+            widget_cache_timeout(self.page_data['type']), cache_info['next_change']
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super(WidgetWrapperView, self).get_context_data(**kwargs)
+        self.page_data['template'] = widget_templates.get(self.page_data['type'])
+        self.page_data['per_user'] = varies_on_user(self.page_data['type'])
+        return context
+
 
 class ApeClassWrapperView(WebPageWrapperView):
     template_name = "classes/ape_class.html"
@@ -223,10 +750,7 @@ class ApeClassWrapperView(WebPageWrapperView):
         context = super(ApeClassWrapperView, self).get_context_data(**kwargs)
         ape_class = get_object_or_404(ApeClass, pk=ape_class_id)
         if self.request.user.is_authenticated:
-            try:
-                is_registered = ClassMember.objects.filter(student=self.request.user.profile, ape_class=ape_class).exists()
-            except UserProfile.DoesNotExist:
-                is_registered = False
+            is_registered = entitlements.for_user(self.request.user.pk).is_registered(ape_class.pk)
             if is_registered:
                 messages.success(self.request, mark_safe("Woohoo! You're registered for this class! See your registration <a href='/profile/'>here</a>."))
         else:
@@ -0,0 +1,68 @@
+"""
+A registry of the compiled template for each type of widget, i.e. widgets/<type>.html for the 'type' in a
+widget's data (a group widget's type is its display_type).
+
+The registry is built once per process, the first time it's used, so rendering a page means a dict lookup
+per widget rather than a trip through the template loaders. With DEBUG on, templates are looked up every
+time so edits show up straight away; otherwise call reload() to pick up new or changed templates.
+"""
+import os
+from threading import Lock
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.template.utils import get_app_template_dirs
+
+TEMPLATE_NAME = 'widgets/{}.html'
+
+_registry = None
+_lock = Lock()
+
+
+def template_dirs():
+    dirs = list(get_app_template_dirs('templates'))
+    for engine in settings.TEMPLATES:
+        dirs += engine.get('DIRS', [])
+    return dirs
+
+
+def widget_types():
+    """
+    The widget types there are templates for
+    """
+    types = set()
+    for template_dir in template_dirs():
+        widgets_dir = os.path.join(template_dir, 'widgets')
+        if os.path.isdir(widgets_dir):
+            types |= {os.path.splitext(f)[0] for f in os.listdir(widgets_dir) if f.endswith('.html')}
+    return types
+
+
+def reload():
+    global _registry
+    with _lock:
+        _registry = {widget_type: get_template(TEMPLATE_NAME.format(widget_type)) for widget_type in widget_types()}
+
+
+def get(widget_type):
+    """
+    The template for widget_type, or None if there isn't one
+    """
+    if settings.DEBUG:
+        try:
+            return get_template(TEMPLATE_NAME.format(widget_type))
+        except TemplateDoesNotExist:
+            return None
+    if _registry is None:
+        reload()
+    return _registry.get(widget_type)
+
+
+@receiver(setting_changed)
+def templates_changed(setting, **kwargs):
+    global _registry
+    if setting in ('TEMPLATES', 'INSTALLED_APPS'):
+        _registry = None
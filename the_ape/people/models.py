@@ -11,6 +11,12 @@ class HouseTeam(models.Model):
     videos = models.ManyToManyField('pages.Video', blank=True)
     show_time = models.CharField(max_length=50, null=True, blank=True)
 
+    # the relations to_data() follows, so they can be prefetched for many house teams at once
+    data_prefetch_related = [
+        'performers__videos', 'logo__link_type', 'logo__link',
+        'image_carousel__images__link_type', 'image_carousel__images__link', 'videos',
+    ]
+
     def __str__(self):
         return self.name
 
@@ -22,7 +28,7 @@ class HouseTeam(models.Model):
         return reverse('house_team', kwargs={'house_team_id': self.pk})
 
     def get_absolute_url(self):
-        return reverse('house_team', kwargs={'house_team_id': self.pk})
+        return reverse('house_team_wrapper', kwargs={'house_team_id': self.pk})
 
     def to_data(self, members=True):
         data = {
@@ -77,6 +83,13 @@ class Person(models.Model):
     objects = PeopleManager()
     all_objects = PeopleManager(inactives=True)
 
+    # the relations to_data() follows, so they can be prefetched for many people at once
+    data_prefetch_related = [
+        'house_teams__logo__link_type', 'house_teams__logo__link',
+        'house_teams__image_carousel__images__link_type', 'house_teams__image_carousel__images__link',
+        'house_teams__videos', 'videos',
+    ]
+
     class Meta(object):
         verbose_name = 'Person'
         verbose_name_plural = 'People'
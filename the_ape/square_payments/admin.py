@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from square_payments.models import SquarePayment
+from square_payments.models import SquarePayment, SeatHold
 
 
 class SquarePaymentAdmin(admin.ModelAdmin):
@@ -13,3 +13,14 @@ class SquarePaymentAdmin(admin.ModelAdmin):
 
 
 admin.site.register(SquarePayment, SquarePaymentAdmin)
+
+
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ['item', 'seats', 'created', 'expires']
+    readonly_fields = ['uuid', 'created', 'expires', 'seats', 'held_event', 'held_class']
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(SeatHold, SeatHoldAdmin)
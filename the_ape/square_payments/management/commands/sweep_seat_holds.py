@@ -0,0 +1,15 @@
+"""
+Gives back the seats held for buyers that didn't finish checking out (see square_payments.models.SeatHold).
+Holds are swept whenever a new one is placed too, run this from cron so seats held for a show nobody else
+is buying for don't stay held.
+"""
+from django.core.management.base import BaseCommand
+
+from square_payments.models import SeatHold
+
+
+class Command(BaseCommand):
+    help = "Releases seat holds that have expired"
+
+    def handle(self, *args, **options):
+        self.stdout.write("Released {} expired seat holds".format(SeatHold.sweep()))
@@ -1,13 +1,19 @@
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
 import squareconnect
 from squareconnect.rest import ApiException
 from squareconnect.apis.transactions_api import TransactionsApi
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 from accounts.models import UserProfile
 from classes.models import ApeClass
 from events.models import Event
+from pages import inventory
 
 squareconnect.configuration.access_token = settings.SQUARE_ACCESS_TOKEN
 api_instance = TransactionsApi()
@@ -37,6 +43,85 @@ class SeatReservation(models.Model):
         raise AssertionError("Neither 'reserved_event' nor 'reserved_class' is set")
 
 
+class SeatHold(models.Model):
+    """
+    Seats set aside for a buyer while they fill in the payment form, so nobody else can buy them in the
+    meantime. They count against what's left (see pages.availability) until they're sold, released, or
+    expire after SEAT_HOLD_TIMEOUT seconds and are swept up.
+    """
+    uuid = models.CharField(max_length=50, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+    seats = models.IntegerField(default=1)
+
+    held_event = models.ForeignKey(Event, null=True, blank=True, on_delete=models.CASCADE)
+    held_class = models.ForeignKey(ApeClass, null=True, blank=True, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return '{} seats for {} until {}'.format(self.seats, self.item, self.expires)
+
+    @property
+    def item(self):
+        return self.held_event or self.held_class
+
+    @classmethod
+    def place(cls, item, seats=1):
+        """
+        Holds seats in an event or class, returning the hold, or None if there aren't that many left.
+        """
+        cls.sweep()
+        if not inventory.hold(item, seats):
+            return None
+        expires = timezone.now() + timedelta(seconds=getattr(settings, 'SEAT_HOLD_TIMEOUT', 60 * 10))
+        return cls.objects.create(
+            uuid=str(uuid4()),
+            expires=expires,
+            seats=seats,
+            held_event=item if isinstance(item, Event) else None,
+            held_class=item if isinstance(item, ApeClass) else None,
+        )
+
+    def claim(self):
+        """
+        Deletes the hold, returning whether it was still there to delete (it may have expired and been swept).
+        """
+        return SeatHold.objects.filter(pk=self.pk).delete()[0] > 0
+
+    def sell(self):
+        """
+        Turns the held seats into taken ones. If the hold had already expired, the seats are taken if
+        they're still there. Returns whether the buyer has their seats.
+        """
+        if self.claim():
+            return inventory.sell_held(self.item, self.seats)
+        return inventory.take(self.item, self.seats)
+
+    def release(self):
+        if self.claim():
+            inventory.release(self.item, self.seats, held=True)
+
+    @classmethod
+    def sweep(cls, now=None):
+        """
+        Releases all the holds that have expired, with an update per event or class they were for.
+        """
+        expired = cls.objects.filter(expires__lte=now or timezone.now())
+        with transaction.atomic():
+            holds = list(expired.select_for_update().values_list('pk', 'held_event_id', 'held_class_id', 'seats'))
+            if not holds:
+                return 0
+            cls.objects.filter(pk__in=[pk for pk, event_id, class_id, seats in holds]).delete()
+            released = defaultdict(int)
+            for pk, event_id, class_id, seats in holds:
+                if event_id is not None:
+                    released[Event, event_id] += seats
+                elif class_id is not None:
+                    released[ApeClass, class_id] += seats
+            for (model, pk), seats in released.items():
+                inventory.release(model(pk=pk), seats, held=True)
+        return len(holds)
+
+
 class SquarePayment(models.Model):
     customer = models.ForeignKey(UserProfile, null=True, related_name='payments')
     created = models.DateTimeField(auto_now_add=True)
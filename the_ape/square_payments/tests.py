@@ -1,3 +1,183 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from threading import Thread
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import ClassMember, EventAttendee
+from classes.models import ApeClass
+from events.models import Event
+from pages import availability
+from square_payments.models import SeatHold, SquarePayment
+
+
+class SeatHoldTest(TestCase):
+    """
+    Tests holding seats for buyers while they check out.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(name="Held Show", bio="A show", ticket_price=5, max_tickets=5,
+                                          start_time=timezone.now() + timedelta(days=1))
+
+    def test_place(self):
+        hold = SeatHold.place(self.event, 3)
+        self.assertIsNotNone(hold)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 3)
+        # (the seat counters only catch up once the hold is committed, see pages.tests.InventoryTest)
+        self.assertEqual(availability.of(self.event).seats_left, 2)
+
+        # held seats can't be bought by anyone else
+        self.assertIsNone(SeatHold.place(self.event, 3))
+        self.assertIsNotNone(SeatHold.place(self.event, 2))
+        self.event.refresh_from_db()
+        self.assertTrue(availability.of(self.event).sold_out)
+
+        hold.release()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 2)
+        # a hold is only given back once
+        hold.release()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 2)
+
+    def test_sell(self):
+        hold = SeatHold.place(self.event, 2)
+        self.assertTrue(hold.sell())
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.tickets_sold, self.event.tickets_held), (2, 0))
+        self.assertFalse(SeatHold.objects.filter(pk=hold.pk).exists())
+
+        # once a hold has expired, its seats are sold only if they're still there
+        hold = SeatHold.place(self.event, 3)
+        self.assertEqual(SeatHold.sweep(now=hold.expires), 1)
+        self.assertTrue(SeatHold.place(self.event, 1))
+        self.assertFalse(hold.sell())
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.tickets_sold, self.event.tickets_held), (2, 1))
+
+    def test_sweep(self):
+        for seats in (1, 2):
+            SeatHold.place(self.event, seats)
+        later = SeatHold.place(self.event, 1)
+        later.expires += timedelta(minutes=5)
+        later.save()
+
+        self.assertEqual(SeatHold.sweep(), 0)
+        with self.assertNumQueries(7):
+            # however many holds there are: loading & deleting them, then an update (and a reload of
+            # the counts) for the show they were for, in a savepoint
+            self.assertEqual(SeatHold.sweep(now=later.expires - timedelta(minutes=1)), 2)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 1)
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+    def test_views(self):
+        self.client.post('/square/hold-seats/', {'model': 'event', 'id': self.event.id, 'seats': 4})
+        response = self.client.post('/square/hold-seats/', {'model': 'event', 'id': self.event.id, 'seats': 3})
+        # the buyer's last hold was given up for the new one
+        self.assertEqual(response.status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 3)
+
+        self.assertEqual(SeatHold.place(self.event, 2).seats, 2)
+        response = self.client.post('/square/hold-seats/', {'model': 'event', 'id': self.event.id, 'seats': 4})
+        self.assertEqual(response.status_code, 409)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 2)
+
+        self.assertEqual(self.client.post('/square/hold-seats/', {'model': 'event', 'id': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post('/square/release-hold/').status_code, 200)
+
+    @override_settings(MAX_SEATS_PER_HOLD=4, SEAT_HOLD_RATE_LIMIT=3)
+    def test_limits(self):
+        hold = {'model': 'event', 'id': self.event.id}
+        self.assertEqual(self.client.post('/square/hold-seats/', dict(hold, seats=5)).status_code, 400)
+        self.assertEqual(self.client.post('/square/hold-seats/', dict(hold, seats=0)).status_code, 400)
+        self.assertEqual(self.client.post('/square/hold-seats/', dict(hold, seats=4)).status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 4)
+
+        # every request counts, against the buyer's session and their IP address
+        self.assertEqual(self.client.post('/square/hold-seats/', dict(hold, seats=1)).status_code, 429)
+        self.assertEqual(Client().post('/square/hold-seats/', dict(hold, seats=1)).status_code, 429)
+        other_buyer = Client(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other_buyer.post('/square/hold-seats/', dict(hold, seats=1)).status_code, 200)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.tickets_held, 5)
+
+
+class ParallelCheckoutTest(TransactionTestCase):
+    """
+    Tests checkouts racing each other for the last seats, without overselling or losing any sales.
+    """
+    serialized_rollback = True
+    attempts = 10
+
+    def setUp(self):
+        cache.clear()
+
+    def checkout_in_parallel(self, url, data, buyers=20):
+        errors = []
+
+        def checkout(i):
+            client = Client()
+            buyer = dict(data, **{'first-name': 'Buyer', 'last-name': str(i),
+                                  'email-address': 'buyer{}@example.com'.format(i)})
+            try:
+                for attempt in range(self.attempts):
+                    try:
+                        # the whole checkout, as it would be with ATOMIC_REQUESTS, so a retry starts afresh
+                        with transaction.atomic():
+                            client.post(url, buyer)
+                        return
+                    except OperationalError:
+                        # sqlite's in memory test database locks whole tables, the checkout that
+                        # didn't get the lock tries again, a few times
+                        if attempt == self.attempts - 1:
+                            raise
+                        time.sleep(0.05)
+            except Exception as e:
+                # threads can't fail the test themselves
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=checkout, args=(i,)) for i in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertFalse([thread for thread in threads if thread.is_alive()], "checkouts still running")
+        if errors:
+            raise errors[0]
+
+    @patch.object(SquarePayment, 'charge', return_value=True)
+    def test_process_card(self, charge):
+        event = Event.objects.create(name="Big Show", bio="A show", ticket_price=5, max_tickets=5,
+                                     start_time=timezone.now() + timedelta(days=1))
+        self.checkout_in_parallel('/square/process-card/', {
+            'nonce': 'card-nonce', 'purchase-model': 'event', 'purchase-id': event.id,
+            'purchase-for': event.name, 'amount': '5', 'num-tickets': '1',
+        })
+
+        event.refresh_from_db()
+        self.assertEqual((event.tickets_sold, event.tickets_held), (5, 0))
+        self.assertEqual(EventAttendee.objects.filter(event=event).count(), 5)
+
+    def test_reserve_seat(self):
+        ape_class = ApeClass.objects.create(name="Free Jam", bio="A jam", class_type='WORKSHOP', price=0,
+                                            max_enrollment=5, start_date=timezone.now() + timedelta(days=1))
+        self.checkout_in_parallel('/square/reserve-seat/', {
+            'reserved-model': 'ape_class', 'reserved-id': ape_class.id, 'reserved-for': ape_class.name,
+        })
+
+        ape_class.refresh_from_db()
+        self.assertEqual((ape_class.students_registered, ape_class.seats_held), (5, 0))
+        self.assertEqual(ClassMember.objects.filter(ape_class=ape_class).count(), 5)
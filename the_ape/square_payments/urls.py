@@ -6,4 +6,6 @@ import square_payments.views as views
 urlpatterns = [
     url(r'^process-card/$', views.process_card, name='process_card'),
     url(r'^reserve-seat/$', views.reserve_seat, name='reserve_seat'),
+    url(r'^hold-seats/$', views.hold_seats, name='hold_seats'),
+    url(r'^release-hold/$', views.release_hold, name='release_hold'),
 ]
@@ -5,17 +5,108 @@ from uuid import uuid4
 
 from squareconnect.rest import ApiException
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.cache import cache
 from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
 
 from accounts.models import ClassMember, EventAttendee, UserProfile
 from classes.models import ApeClass
 from events.models import Event
-from square_payments.models import SquarePayment, SeatReservation
+from pages import inventory
+from square_payments.models import SquarePayment, SeatReservation, SeatHold
+
+# where the seats held for the buyer while they check out are kept track of
+SEAT_HOLD_SESSION_KEY = 'seat_hold'
+# how many holds a session or IP address has asked for lately
+SEAT_HOLD_COUNT_KEY = 'seat_hold_count:{kind}:{id}'
+
+
+def sold_out(request, name, item):
+    messages.error(request, "Sorry, there aren't enough seats left for {}. Nothing was charged.".format(name))
+    return HttpResponseRedirect(item.get_absolute_url())
+
+
+def release_session_hold(request):
+    uuid = request.session.pop(SEAT_HOLD_SESSION_KEY, None)
+    hold = SeatHold.objects.filter(uuid=uuid).first() if uuid else None
+    if hold is not None:
+        hold.release()
+
+
+def too_many_holds(request):
+    """
+    Counts a request for a hold against the buyer's session and IP address, returning whether either has
+    asked for more than SEAT_HOLD_RATE_LIMIT in the last SEAT_HOLD_RATE_PERIOD seconds.
+    """
+    limit = getattr(settings, 'SEAT_HOLD_RATE_LIMIT', 10)
+    period = getattr(settings, 'SEAT_HOLD_RATE_PERIOD', 60)
+    too_many = False
+    for kind, id in (('session', request.session.session_key), ('ip', request.META.get('REMOTE_ADDR'))):
+        if not id:
+            continue
+        key = SEAT_HOLD_COUNT_KEY.format(kind=kind, id=id)
+        if cache.add(key, 1, timeout=period):
+            continue
+        try:
+            too_many = cache.incr(key) > limit or too_many
+        except ValueError:
+            # expired between the add and the incr, this is the first of a new period
+            cache.add(key, 1, timeout=period)
+    return too_many
+
+
+def take_seats(request, item, seats):
+    """
+    Takes seats for the buyer, from the ones held for them if they're for the same thing, returning whether
+    they got them.
+    """
+    uuid = request.session.pop(SEAT_HOLD_SESSION_KEY, None)
+    hold = SeatHold.objects.filter(uuid=uuid).first() if uuid else None
+    if hold is not None:
+        if hold.item == item and hold.seats == seats:
+            return hold.sell()
+        hold.release()
+    return inventory.take(item, seats)
+
+
+def hold_seats(request):
+    """
+    Holds seats for the buyer when they open the payment form, so they can't sell out while they fill it in.
+    A buyer only ever has one hold, opening another payment form gives up the last one.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+    if too_many_holds(request):
+        return JsonResponse({'error': "Too many holds, try again in a minute"}, status=429)
+    try:
+        seats = int(request.POST.get('seats', 1))
+        if request.POST.get('model') == 'ape_class':
+            item = ApeClass.objects.get(id=int(request.POST['id']))
+        else:
+            item = Event.objects.get(id=int(request.POST['id']))
+    except (KeyError, ValueError, ApeClass.DoesNotExist, Event.DoesNotExist):
+        return JsonResponse({'error': "Nothing to hold seats for"}, status=400)
+    if not 1 <= seats <= getattr(settings, 'MAX_SEATS_PER_HOLD', 10):
+        return JsonResponse({'error': "Can't hold that many seats"}, status=400)
+
+    release_session_hold(request)
+    hold = SeatHold.place(item, seats)
+    if hold is None:
+        return JsonResponse({'error': "There aren't enough seats left"}, status=409)
+    request.session[SEAT_HOLD_SESSION_KEY] = hold.uuid
+    return JsonResponse({'seats': hold.seats, 'expires': hold.expires.isoformat()})
+
+
+def release_hold(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+    release_session_hold(request)
+    return JsonResponse({})
 
 
 def reserve_seat(request):
@@ -54,7 +145,8 @@ def reserve_seat(request):
 
         if reserved_model == 'ape_class':
             reservation.reserved_class = ApeClass.objects.get(id=reserved_id)
-            reservation.reserved_class.save()
+            if not inventory.take(reservation.reserved_class):
+                return sold_out(request, reserved_for, reservation.reserved_class)
             class_member = ClassMember.objects.create(student=user.profile, ape_class=reservation.reserved_class)
             registration = class_member.create_registration()
             class_member.send_registration_email(registration=registration)
@@ -62,8 +154,8 @@ def reserve_seat(request):
 
         elif reserved_model == 'event':
             reservation.reserved_event = Event.objects.get(id=reserved_id)
-            reservation.reserved_event.tickets_sold += 1
-            reservation.reserved_event.save()
+            if not inventory.take(reservation.reserved_event):
+                return sold_out(request, reserved_for, reservation.reserved_event)
             redirect_url = reverse('event_wrapper', kwargs={'event_id': reservation.reserved_event.id})
 
             attendee, created = EventAttendee.objects.get_or_create(event=reservation.reserved_event, attendee=user.profile)
@@ -122,28 +214,31 @@ def process_card(request):
 
         if purchase_model == 'ape_class':
             payment.purchase_class = ApeClass.objects.get(id=purchase_id)
+            purchase, seats = payment.purchase_class, 1
         elif purchase_model == 'event':
             payment.purchase_event = Event.objects.get(id=purchase_id)
+            purchase, seats = payment.purchase_event, int(num_tickets)
         payment.save()
 
+        # the seats are taken before the card is charged, so nobody pays for a seat that's gone
+        if not take_seats(request, purchase, seats):
+            return sold_out(request, purchase_for, purchase)
+
         success = payment.charge()
         if not success:
+            inventory.release(purchase, seats)
             messages.error(request, 'Your purchase for {} was not successful. Your card was ' \
                                     'not charged, please contact talktotheape@gmail.com for further details.'.format(purchase_for))
             return HttpResponseRedirect(reverse('home'))
 
         #  handle successful purchases
         if purchase_model == 'ape_class':
-            payment.purchase_class.students_registered += 1
-            payment.purchase_class.save()
             class_member = ClassMember.objects.create(student=user.profile, ape_class=payment.purchase_class)
             registration = class_member.create_registration()
             class_member.send_registration_email(registration=registration)
             redirect_url = reverse('ape_class_wrapper', kwargs={'ape_class_id': payment.purchase_class.id})
 
         elif purchase_model == 'event':
-            payment.purchase_event.tickets_sold += int(num_tickets)
-            payment.purchase_event.save()
             redirect_url = reverse('event_wrapper', kwargs={'event_id': payment.purchase_event.id})
 
             attendee, created = EventAttendee.objects.get_or_create(event=payment.purchase_event, attendee=user.profile)
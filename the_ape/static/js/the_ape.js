@@ -10,4 +10,111 @@ $(document).ready(function(){
         });
     });
     
-});
\ No newline at end of file
+});
+
+/* load widgets further down the page as they're scrolled into view */
+$(document).ready(function(){
+    function loadWidget(placeholder) {
+        $.get($(placeholder).data('src'), function(html) {
+            var widget = $($.parseHTML(html, document, true));
+            $(placeholder).replaceWith(widget);
+            // cached for as long as the page is, so its buy buttons need filling in too
+            showAvailability(widget);
+        });
+    }
+
+    var placeholders = $('.lazy-widget');
+    if (!placeholders.length) {
+        return;
+    }
+    if ('IntersectionObserver' in window) {
+        var observer = new IntersectionObserver(function(entries) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    loadWidget(entry.target);
+                }
+            });
+        }, {rootMargin: '400px'});
+        placeholders.each(function() {
+            observer.observe(this);
+        });
+    } else {
+        placeholders.each(function() {
+            loadWidget(this);
+        });
+    }
+});
+/* pages can be cached for a while, so buy buttons are switched to sold out (or back) from the availability API */
+function showAvailability(elements) {
+    var items = $(elements).find('[data-availability]').addBack('[data-availability]');
+    if (!items.length) {
+        return;
+    }
+    var ids = {};
+    items.each(function() {
+        var type = $(this).data('availability');
+        ids[type] = ids[type] || [];
+        if (ids[type].indexOf($(this).data('id')) < 0) {
+            ids[type].push($(this).data('id'));
+        }
+    });
+    var query = {};
+    $.each(ids, function(type, typeIds) {
+        query[type] = typeIds.join(',');
+    });
+    $.getJSON('/api/availability.json', query, function(data) {
+        items.each(function() {
+            var seats = (data[$(this).data('availability')] || {})[$(this).data('id')];
+            if (!seats) {
+                return;
+            }
+            var soldOut = seats.sold_out || seats.full;
+            $(this).find('.availability-sold-out').toggle(soldOut);
+            $(this).find('.availability-open').toggle(!soldOut);
+            $(this).find('.availability-enabled').prop('disabled', soldOut);
+        });
+    });
+}
+
+$(document).ready(function(){
+    showAvailability(document.body);
+});
+
+/* seats are held while the payment form is open, so they can't sell out while it's filled in */
+$(document).ready(function(){
+    var form = $('#sq-ccbox #nonce-form');
+    if (!form.length) {
+        return;
+    }
+    function post(url, data) {
+        data.csrfmiddlewaretoken = form.find('[name=csrfmiddlewaretoken]').val();
+        return $.post(url, data);
+    }
+    $('#sq-ccbox').on('show.bs.modal', function() {
+        $('#sq-hold-message').remove();
+        $('#sq-creditcard').prop('disabled', false);
+        var seats = parseInt($('#sq-num-tickets').val(), 10);
+        if (!(seats >= 1)) {
+            seats = 1;
+        }
+        post(form.data('hold-url'), {
+            model: $('#purchase-model').val(),
+            id: $('#purchase-id').val(),
+            seats: seats
+        }).fail(function(xhr) {
+            if (xhr.status == 409) {
+                $('#sq-creditcard').prop('disabled', true)
+                    .before('<p id="sq-hold-message">Sorry, there aren\'t enough seats left.</p>');
+            }
+        });
+    });
+    $('#sq-ccbox').on('hidden.bs.modal', function() {
+        if (!form.data('submitted')) {
+            post(form.data('release-url'), {});
+        }
+    });
+    form.on('submit', function() {
+        form.data('submitted', true);
+    });
+});
@@ -13,6 +13,12 @@ DEBUG = True
 ########## END DEBUG CONFIGURATION
 
 
+########## TEMPLATE CONFIGURATION
+# pick up template edits without a restart
+TEMPLATES[0]['OPTIONS']['loaders'] = MINIFYING_TEMPLATE_LOADERS
+########## END TEMPLATE CONFIGURATION
+
+
 ########## EMAIL CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
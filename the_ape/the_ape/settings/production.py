@@ -72,9 +72,12 @@ DATABASES = {
 
 ########## CACHE CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# Shared by every worker: the page slug index, slug redirects, event timeline, widget dependencies and
+# seat counters are all kept in step across workers through it, which a per-process cache can't do.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
     }
 }
 ########## END CACHE CONFIGURATION